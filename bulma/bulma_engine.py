@@ -1,93 +1,163 @@
+import time
+from collections import OrderedDict
 from pathlib import Path
+from threading import Lock, Thread
 import pandas as pd
 import numpy as np
 import joblib
 
-# -- Indicator functions --
-def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    hl = df["high"] - df["low"]
-    hc = (df["high"] - df["close"].shift()).abs()
-    lc = (df["low"] - df["close"].shift()).abs()
-    tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
-
-def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    delta = df["close"].diff()
-    gain = delta.clip(lower=0).rolling(period).mean()
-    loss = (-delta.clip(upper=0)).rolling(period).mean()
-    rs = gain / loss
-    return 100 - 100 / (1 + rs)
-
-def calculate_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9):
-    fast_ema = df["close"].ewm(span=fast).mean()
-    slow_ema = df["close"].ewm(span=slow).mean()
-    macd = fast_ema - slow_ema
-    macd_sig = macd.ewm(span=signal).mean()
-    return macd, macd_sig, macd - macd_sig
+from core.indicators import IndicatorSet, as_indicators, timestamps
+from core.latency import timed
+from core.strategy import gohan_score, jiren_score, freezer_score
+from bulma.flat_model import load_flat
 
 # -- Strategy functions --
-def gohan_strat(df: pd.DataFrame):
-    if len(df) < 50:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    sma10 = df["close"].rolling(10).mean().iloc[-1]
-    sma50 = df["close"].rolling(50).mean().iloc[-1]
-    vol_now = df["volume"].iloc[-1]
-    vol_avg = df["volume"].rolling(20).mean().iloc[-1]
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-2]) / df["close"].iloc[-2]
-    score = 0.0
-    if 30 <= rsi <= 70:
-        score += 2
-    elif rsi < 30:
-        score += 3
-    if macd_hist.iloc[-1] > 0:
-        score += 2
-    if sma10 > sma50:
-        score += 2
-    if vol_now > vol_avg * 1.2:
-        score += 1.5
-    if price_change > 0.01:
-        score += 1.5
-    return score
-
-def jiren_strat(df: pd.DataFrame):
-    if len(df) < 50:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    macd_line, macd_sig, _ = calculate_macd(df)
-    sma20 = df["close"].rolling(20).mean().iloc[-1]
-    vol_now = df["volume"].iloc[-1]
-    vol_avg = df["volume"].rolling(20).mean().iloc[-1]
-    score = 0.0
-    if 40 <= rsi <= 65:
-        score += 2.5
-    if macd_line.iloc[-1] > macd_sig.iloc[-1]:
-        score += 2.5
-    if df["close"].iloc[-1] > sma20:
-        score += 2
-    if vol_now > vol_avg * 1.1:
-        score += 0.5
-    return score
-
-def freezer_strat(df: pd.DataFrame):
-    if len(df) < 30:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-5]) / df["close"].iloc[-5]
-    score = 0.0
-    if rsi > 50:
-        score += 2
-    if macd_hist.iloc[-1] > 0:
-        score += 2
-    if price_change > 0.02:
-        score += 2
-    return score
+# Scores only (no signal); accept a candle DataFrame or an IndicatorSet.
+
+def gohan_strat(df):
+    return gohan_score(as_indicators(df))
+
+def jiren_strat(df):
+    return jiren_score(as_indicators(df))
+
+def freezer_strat(df):
+    return freezer_score(as_indicators(df))
 
 def beerus_vote(g, j, f):
     return (g + j + f) / 3
 
+FEATURE_COLS = [
+    'pct_1','pct_6','pct_24','momentum','volatility','range_atr',
+    'pos_in_range','bollinger_b','vol_z','sin_hour','cos_hour',
+    'sin_dow','cos_dow','pct_1_lag1','pct_1_lag2',
+    'volatility_lag1','volatility_lag2','momentum_lag1','momentum_lag2',
+    'gohan_conf','jiren_conf','freezer_conf','beerus_conf'
+]
+
+# -- Latest-row features --
+# Only the newest usable row is ever scored, so it is built on its own.
+# pct changes, rolling max/min/median/quantiles and the calendar terms read
+# the last 24 bars at most; the rolling mean/std and the momentum EWM still
+# go through pandas' 1-D kernels over the whole close series, because their
+# rounding depends on the running sums carried from the first bar.
+
+def _tail_quantile(sorted_vals, q):
+    # pandas roll_quantile, linear interpolation
+    pos = q * (len(sorted_vals) - 1)
+    lo = int(pos)
+    if pos == lo:
+        return sorted_vals[lo]
+    return sorted_vals[lo] + (sorted_vals[lo + 1] - sorted_vals[lo]) * (pos - lo)
+
+def _tail_median(sorted_vals):
+    mid = len(sorted_vals) // 2
+    if len(sorted_vals) % 2:
+        return sorted_vals[mid]
+    return (sorted_vals[mid] + sorted_vals[mid - 1]) / 2
+
+def _full_windows(valid, n):
+    """rolling(n) with the default min_periods: True where all n values are present."""
+    missing = np.concatenate([[0], np.cumsum(~valid)])
+    out = np.zeros(len(valid), dtype=bool)
+    if len(valid) >= n:
+        out[n - 1:] = missing[n:] == missing[:-n]
+    return out
+
+def _defined(a, *lags):
+    ok = ~np.isnan(a)
+    for k in lags:
+        ok[k:] &= ~np.isnan(a[:-k])
+        ok[:k] = False
+    return ok
+
+def latest_features(candles: pd.DataFrame):
+    """
+    The first 19 FEATURE_COLS for the newest row that survives dropna(),
+    that row's close and low, and the positions of every row dropna() keeps
+    (the frame the champions are scored on), or None when no row survives.
+    Same numbers as engineering every column over the frame and dropping NaNs.
+    """
+    close = candles["close"].to_numpy(dtype=float)
+    high = candles["high"].to_numpy(dtype=float)
+    low = candles["low"].to_numpy(dtype=float)
+    volume = candles["volume"].to_numpy(dtype=float)
+    n = len(close)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.full(n, np.nan)
+        pct[1:] = close[1:] / close[:-1] - 1
+        pct_6 = np.full(n, np.nan)
+        pct_6[6:] = close[6:] / close[:-6] - 1
+        pct_24 = np.full(n, np.nan)
+        pct_24[24:] = close[24:] / close[:-24] - 1
+        pct_s = pd.Series(pct)
+        momentum = pct_s.ewm(span=12).mean().to_numpy()
+        volatility = pct_s.rolling(24).std().to_numpy()
+        range_atr = pd.Series(high - low).rolling(14).mean().to_numpy()
+        close_s = pd.Series(close)
+        ma20 = close_s.rolling(20).mean().to_numpy()
+        std20 = close_s.rolling(20).std().to_numpy()
+        bollinger = (close - ma20) / (2 * std20 + 1e-9)
+
+        # rows dropna() keeps: every input present and every feature defined
+        keep = candles.notna().all(axis=1).to_numpy(copy=True)
+        keep &= _defined(pct, 1, 2) & _defined(momentum, 1, 2) & _defined(volatility, 1, 2)
+        keep &= _defined(pct_6) & _defined(pct_24) & _defined(range_atr) & _defined(bollinger)
+        # pos_in_range (24-bar high/low) and vol_z (24-bar volume median/IQR)
+        keep &= _full_windows(~np.isnan(high), 24) & _full_windows(~np.isnan(low), 24)
+        keep &= _full_windows(~np.isnan(volume), 24)
+
+        kept = np.flatnonzero(keep)
+        while len(kept):
+            p = kept[-1]
+            hi24, lo24 = high[p - 23:p + 1], low[p - 23:p + 1]
+            vols = np.sort(volume[p - 23:p + 1])
+            when = pd.to_datetime(candles.index[p:p + 1], unit="s")
+            hour, dow = when.hour.to_numpy(), when.dayofweek.to_numpy()
+            vol_iqr = _tail_quantile(vols, 0.75) - _tail_quantile(vols, 0.25)
+            row = [
+                pct[p], pct_6[p], pct_24[p],
+                momentum[p], volatility[p], range_atr[p],
+                (close[p] - lo24.min()) / (hi24.max() - lo24.min() + 1e-9),
+                bollinger[p],
+                (volume[p] - _tail_median(vols)) / (vol_iqr + 1e-9),
+                np.sin(2 * np.pi * hour / 24)[0], np.cos(2 * np.pi * hour / 24)[0],
+                np.sin(2 * np.pi * dow / 7)[0], np.cos(2 * np.pi * dow / 7)[0],
+                pct[p - 1], pct[p - 2],
+                volatility[p - 1], volatility[p - 2], momentum[p - 1], momentum[p - 2],
+            ]
+            if not np.isnan(row).any():
+                return row, close[p], low[p], kept
+            # NaN from the arithmetic itself (inf - inf): dropna() loses this row too
+            kept = kept[:-1]
+    return None
+
+# model outputs kept for (symbol, last closed candle, model version)
+PREDICTION_CACHE_SIZE = 256
+# seconds between checks for a retrained model
+MODEL_POLL_INTERVAL = 60
+
+# -- Model artifacts --
+def model_artifact(here: Path):
+    """The artifact to load and its version: the flat export unless the
+    joblib model is newer. bulma_train replaces each file atomically."""
+    model_path = here / "bulma_model.joblib"
+    flat_path = here / "bulma_model.npz"
+    if flat_path.exists() and (
+        not model_path.exists() or flat_path.stat().st_mtime >= model_path.stat().st_mtime
+    ):
+        path = flat_path
+    else:
+        path = model_path
+    return path, f"{path.name}@{path.stat().st_mtime_ns}"
+
+def load_artifact(path: Path):
+    """(scaler, model) from a flat export or the joblib pair next to it."""
+    if path.suffix == ".npz":
+        # the flat export runs on NumPy alone
+        return load_flat(path)
+    return joblib.load(path.with_name("bulma_scaler.joblib")), joblib.load(path)
+
 class BulmaEngine:
     def __init__(self):
         here = Path(__file__).resolve().parent
@@ -95,91 +165,172 @@ class BulmaEngine:
         self.stop_losses = {}
         self.profit_tiers = {}
         self.trailing_highs = {}
+        self.predictions = OrderedDict()
 
-        model_path = here / "bulma_model.joblib"
-        scaler_path = here / "bulma_scaler.joblib"
-        self.scaler = joblib.load(scaler_path)
-        self.model = joblib.load(model_path)
+        self.here = here
+        path, self.model_version = model_artifact(here)
+        self.scaler, self.model = load_artifact(path)
+        print(f"📦 Loaded Bulma model {self.model_version}")
         print(f"❓ Model classes: {self.model.classes_}")
 
+        # retrained models are loaded off-thread and swapped in by predict_batch
+        self._pending = None
+        self._swap_lock = Lock()
+
+    def watch_model(self, interval: float = MODEL_POLL_INTERVAL):
+        """Poll for a retrained model in a daemon thread. Loading and warming
+        happen there; the swap itself waits for the next predict_batch."""
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._load_newer()
+                except Exception as e:
+                    print(f"[DEBUG] Bulma model reload failed: {e}")
+        Thread(target=poll, name="bulma-model-watch", daemon=True).start()
+
+    def _load_newer(self):
+        path, version = model_artifact(self.here)
+        pending = self._pending
+        if version == self.model_version or (pending is not None and pending[2] == version):
+            return
+        scaler, model = load_artifact(path)
+        if model_artifact(self.here)[1] != version:
+            return  # replaced mid-load; the next poll takes the final files
+        # warm-up pass so the first live prediction does not pay for it
+        probe = pd.DataFrame([[0.0] * len(scaler.feature_names_in_)], columns=scaler.feature_names_in_)
+        model.predict_proba(scaler.transform(probe))
+        with self._swap_lock:
+            self._pending = (scaler, model, version)
+        print(f"📦 Bulma model {version} ready, swapping in next cycle")
+
+    def _swap_model(self):
+        with self._swap_lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self.scaler, self.model, self.model_version = pending
+            print(f"🔁 Bulma model swapped to {self.model_version}")
+
     def predict(self, symbol: str, candles: pd.DataFrame, current_balance: float = 0.0):
-        if candles.empty or len(candles) < 50:
-            return "hold", 0.0
-
-        df = candles.copy()
-        if "volume" not in df.columns and len(df.columns) >= 6:
-            df.rename(columns={df.columns[-1]: "volume"}, inplace=True)
-        df.index = pd.to_datetime(df.index, unit="s")
-
-        # feature engineering
-        df["pct_1"] = df["close"].pct_change()
-        df["pct_6"] = df["close"].pct_change(6)
-        df["pct_24"] = df["close"].pct_change(24)
-        df["momentum"] = df["close"].pct_change().ewm(span=12).mean()
-        df["volatility"] = df["pct_1"].rolling(24).std()
-        df["range_atr"] = (df["high"] - df["low"]).rolling(14).mean()
-        roll_hi = df["high"].rolling(24).max()
-        roll_lo = df["low"].rolling(24).min()
-        df["pos_in_range"] = (df["close"] - roll_lo) / (roll_hi - roll_lo + 1e-9)
-        ma20 = df["close"].rolling(20).mean()
-        std20 = df["close"].rolling(20).std()
-        df["bollinger_b"] = (df["close"] - ma20) / (2 * std20 + 1e-9)
-        vol_med = df["volume"].rolling(24).median()
-        vol_iqr = df["volume"].rolling(24).quantile(0.75) - df["volume"].rolling(24).quantile(0.25)
-        df["vol_z"] = (df["volume"] - vol_med) / (vol_iqr + 1e-9)
-        ts = pd.to_datetime(df.index)
-        df["sin_hour"] = np.sin(2 * np.pi * ts.hour / 24)
-        df["cos_hour"] = np.cos(2 * np.pi * ts.hour / 24)
-        df["sin_dow"] = np.sin(2 * np.pi * ts.dayofweek / 7)
-        df["cos_dow"] = np.cos(2 * np.pi * ts.dayofweek / 7)
-        df["pct_1_lag1"] = df["pct_1"].shift(1)
-        df["pct_1_lag2"] = df["pct_1"].shift(2)
-        df["volatility_lag1"] = df["volatility"].shift(1)
-        df["volatility_lag2"] = df["volatility"].shift(2)
-        df["momentum_lag1"] = df["momentum"].shift(1)
-        df["momentum_lag2"] = df["momentum"].shift(2)
-        df.dropna(inplace=True)
-        latest = df.iloc[-1]
-
-        # strat scores
-        g = gohan_strat(df)
-        j = jiren_strat(df)
-        f = freezer_strat(df)
-        bvote = beerus_vote(g, j, f)
-
-        # assemble features
-        cols = [
-            'pct_1','pct_6','pct_24','momentum','volatility','range_atr',
-            'pos_in_range','bollinger_b','vol_z','sin_hour','cos_hour',
-            'sin_dow','cos_dow','pct_1_lag1','pct_1_lag2',
-            'volatility_lag1','volatility_lag2','momentum_lag1','momentum_lag2',
-            'gohan_conf','jiren_conf','freezer_conf','beerus_conf'
-        ]
-        feat = pd.DataFrame([[
-            latest['pct_1'],latest['pct_6'],latest['pct_24'],
-            latest['momentum'],latest['volatility'],latest['range_atr'],
-            latest['pos_in_range'],latest['bollinger_b'],latest['vol_z'],
-            latest['sin_hour'],latest['cos_hour'],
-            latest['sin_dow'],latest['cos_dow'],latest['pct_1_lag1'],latest['pct_1_lag2'],
-            latest['volatility_lag1'],latest['volatility_lag2'],latest['momentum_lag1'],latest['momentum_lag2'],
-            g,j,f,bvote
-        ]], columns=cols)
+        return self.predict_batch({symbol: candles}, {symbol: current_balance})[symbol]
+
+    def predict_batch(self, candles_by_symbol: dict, balances: dict | None = None) -> dict:
+        """
+        Predict every symbol in one go: one feature matrix, one scaler transform
+        and one model pass, then the per-symbol entry/tier/stop logic.
+        The model sees closed candles only: the newest row of each frame is the
+        hour still forming. Symbols whose last closed candle was already scored
+        by this model reuse that output, and the entry/tier/stop logic always
+        runs on the forming candle's close and low.
+        Returns {symbol: (signal, confidence)}.
+        """
+        self._swap_model()
+        results, ready = {}, []
+        for symbol, candles in candles_by_symbol.items():
+            hit = self._cached(symbol, candles)
+            if hit is not None:
+                pred, conf_proba, ctx = hit
+                print(f"DEBUG: {symbol} cached pred = {pred!r}")
+                results[symbol] = self._decide(symbol, pred, conf_proba, self._live(ctx, candles))
+                continue
+            try:
+                prepared = self._prepare(symbol, candles)
+            except Exception as e:
+                print(f"[DEBUG] Bulma features failed for {symbol}: {e}")
+                prepared = None
+            if prepared is None:
+                results[symbol] = ("hold", 0.0)
+            else:
+                ready.append((symbol, prepared))
+        if not ready:
+            return results
+
+        feat = pd.DataFrame([row for _, (row, _) in ready], columns=FEATURE_COLS)
         # align scaler
         for c in self.scaler.feature_names_in_:
             if c not in feat.columns:
                 feat[c] = 0.0
         feat = feat[self.scaler.feature_names_in_]
-        X_scaled = self.scaler.transform(feat)
+        with timed("scaler"):
+            X_scaled = self.scaler.transform(feat)
+
+        # predictions: one probability pass; the class is its argmax, which is
+        # exactly how CalibratedClassifierCV.predict picks it
+        with timed("model"):
+            probas = self.model.predict_proba(X_scaled)
+        preds = self.model.classes_[np.argmax(probas, axis=1)]
+        for (symbol, (_, ctx)), pred, conf_proba in zip(ready, preds, probas):
+            print(f"DEBUG: {symbol} raw pred = {pred!r}")
+            candles = candles_by_symbol[symbol]
+            self._remember(symbol, candles, (pred, conf_proba, ctx))
+            results[symbol] = self._decide(symbol, pred, conf_proba, self._live(ctx, candles))
+        return {symbol: results[symbol] for symbol in candles_by_symbol}
 
-        # predictions
-        pred = self.model.predict(X_scaled)[0]
-        print(f"DEBUG: raw pred = {pred!r}")
-        conf_proba = self.model.predict_proba(X_scaled)[0]
-        confidence = bvote * 0.5 + max(conf_proba) * 10 * 0.5
+    def _cache_key(self, symbol: str, candles: pd.DataFrame):
+        if len(candles) < 51:
+            return None
+        # the model input ends at the last closed candle, which no longer changes
+        return symbol, timestamps(candles)[-2], self.model_version
 
-        close_price = latest['close']
-        atr_val = calculate_atr(df).iloc[-1]
+    def _cached(self, symbol: str, candles: pd.DataFrame):
+        """(pred, proba, ctx) stored for this symbol's last closed candle, or None."""
+        key = self._cache_key(symbol, candles)
+        hit = self.predictions.get(key) if key is not None else None
+        if hit is None:
+            return None
+        self.predictions.move_to_end(key)
+        return hit
+
+    def _remember(self, symbol: str, candles: pd.DataFrame, output):
+        key = self._cache_key(symbol, candles)
+        if key is None:
+            return
+        self.predictions[key] = output
+        self.predictions.move_to_end(key)
+        while len(self.predictions) > PREDICTION_CACHE_SIZE:
+            self.predictions.popitem(last=False)
+
+    @staticmethod
+    def _live(ctx: dict, candles: pd.DataFrame) -> dict:
+        """ctx with close/low moved to the forming candle, when it has them."""
+        close, low = candles["close"].iat[-1], candles["low"].iat[-1]
+        if close == close and low == low:
+            return {**ctx, "close": close, "low": low}
+        return ctx
+
+    def _prepare(self, symbol: str, candles: pd.DataFrame):
+        """Feature row of the last closed candle plus the ATR/vote the trade
+        logic needs, or None to hold."""
+        # the newest row is the hour still forming
+        candles = candles.iloc[:-1]
+        if candles.empty or len(candles) < 50:
+            return None
+
+        if "volume" not in candles.columns and len(candles.columns) >= 6:
+            candles = candles.rename(columns={candles.columns[-1]: "volume"})
+        with timed("features", symbol):
+            latest = latest_features(candles)
+        if latest is None:
+            return None
+        features, close_price, low_price, kept = latest
+
+        # strat scores and ATR on the rows dropna() keeps, as the model was
+        # trained and the batch formulas define them; nothing carries over
+        # between calls, so the output depends on `candles` alone
+        with timed("champions", symbol):
+            ind = IndicatorSet.from_frame(candles.iloc[kept])
+            g = gohan_strat(ind)
+            j = jiren_strat(ind)
+            f = freezer_strat(ind)
+            bvote = beerus_vote(g, j, f)
+
+        atr_val = ind.atr
         atr_val = atr_val if not pd.isna(atr_val) else close_price * 0.02
+        return features + [g, j, f, bvote], {"bvote": bvote, "close": close_price, "low": low_price, "atr": atr_val}
+
+    def _decide(self, symbol: str, pred, conf_proba, ctx: dict):
+        confidence = ctx["bvote"] * 0.5 + max(conf_proba) * 10 * 0.5
+        close_price, atr_val = ctx["close"], ctx["atr"]
 
         # dynamic labels
         buy_label = next((c for c in self.model.classes_ if str(c).lower()=='buy'), None)
@@ -198,7 +349,7 @@ class BulmaEngine:
             if tier>=2 and close_price<=self.trailing_highs[symbol]-4.6*atr_val and confidence>=7.5:
                 self._clear_position(symbol)
                 return 'sell',confidence
-            if df['low'].iloc[-1]<=self.stop_losses.get(symbol,0) and confidence>=7.5:
+            if ctx['low']<=self.stop_losses.get(symbol,0) and confidence>=7.5:
                 self._clear_position(symbol)
                 return 'sell',confidence
             # fallback model-driven sell
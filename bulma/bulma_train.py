@@ -1,103 +1,252 @@
+import argparse
 import glob
+import hashlib
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
+import sys
+import time
+import warnings
 
 import joblib
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.ensemble import HistGradientBoostingClassifier
-from sklearn.model_selection import TimeSeriesSplit, cross_val_score
+from sklearn.frozen import FrozenEstimator
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit, cross_val_score
 from sklearn.preprocessing import RobustScaler
 
+# run as a script from bulma/, the repo root (core/, bulma/) is not on the path yet
+if __package__ in (None, ""):
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core.indicators import calculate_macd
+from bulma.flat_model import FLAT_MODEL_PATH, export_flat
+
 # Paths
 BULMA_DIR = pathlib.Path(__file__).resolve().parent
 CSV_GLOB = str(BULMA_DIR / "*.csv")
+# core.backfill --format npy output: structured RAW_COLS rows, oldest first
+NPY_GLOB = str(BULMA_DIR / "*.raw.npy")
 MODEL_PATH = BULMA_DIR / "bulma_model.joblib"
 SCALER_PATH = BULMA_DIR / "bulma_scaler.joblib"
-
-# Indicators
-def calculate_rsi(df, period=14):
-    delta = df["close"].diff()
-    gain = delta.clip(lower=0).rolling(period).mean()
-    loss = (-delta.clip(upper=0)).rolling(period).mean()
-    rs = gain / loss
-    return 100 - 100 / (1 + rs)
-
-def calculate_macd(df, fast=12, slow=26, signal=9):
-    fast_ema = df["close"].ewm(span=fast).mean()
-    slow_ema = df["close"].ewm(span=slow).mean()
-    macd = fast_ema - slow_ema
-    macd_sig = macd.ewm(span=signal).mean()
-    return macd, macd_sig, macd - macd_sig
+CACHE_DIR = BULMA_DIR / "cache"
+RAW_COLS = ["unix", "open", "high", "low", "close", "volume"]
+RAW_DTYPES = {
+    "unix": "int64", "open": "float64", "high": "float64",
+    "low": "float64", "close": "float64", "volume": "float64",
+}
+# bump whenever engineer(), champion_scores() or make_labels() change output
+FEATURE_VERSION = 1
+# raw bars re-engineered behind newly ingested candles: covers the 100-bar
+# champion window and lets the momentum EWM settle below float precision
+INGEST_CONTEXT = 300
+# newest rows the flat export is checked on against sklearn's predict_proba
+FLAT_CHECK_ROWS = 5000
 
 # Champions
-def gohan_strat(df):
-    if len(df) < 50:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    macd_hist = macd_hist.iloc[-1]
-    sma10 = df["close"].rolling(10).mean().iloc[-1]
-    sma50 = df["close"].rolling(50).mean().iloc[-1]
-    vol_now, vol_avg = df["volume"].iloc[-1], df["volume"].rolling(20).mean().iloc[-1]
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-2]) / df["close"].iloc[-2]
-    score = 0.0
-    if 30 <= rsi <= 70: score += 2
-    elif rsi < 30:      score += 3
-    if macd_hist > 0:   score += 2
-    if sma10 > sma50:   score += 2
-    if vol_now > vol_avg * 1.2: score += 1.5
-    if price_change > 0.01:     score += 1.5
-    return score
-
-def jiren_strat(df):
-    if len(df) < 50:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    macd_line, macd_sig, _ = calculate_macd(df)
-    macd_line, macd_sig = macd_line.iloc[-1], macd_sig.iloc[-1]
-    sma20 = df["close"].rolling(20).mean().iloc[-1]
-    vol_now, vol_avg = df["volume"].iloc[-1], df["volume"].rolling(20).mean().iloc[-1]
-    score = 0.0
-    if 40 <= rsi <= 65: score += 2.5
-    if macd_line > macd_sig: score += 2.5
-    if df["close"].iloc[-1] > sma20: score += 2
-    if vol_now > vol_avg * 1.1: score += 0.5
-    return score
-
-def freezer_strat(df):
-    if len(df) < 30:
-        return 0.0
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    macd_hist = macd_hist.iloc[-1]
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-5]) / df["close"].iloc[-5]
-    score = 0.0
-    if rsi > 50: score += 2
-    if macd_hist > 0: score += 2
-    if price_change > 0.02: score += 2
-    return score
-
 def beerus_vote(g, j, f):
     return (g + j + f) / 3
 
-# Load CSVs
-def load_all_csv():
-    files = glob.glob(CSV_GLOB)
+# Vectorized champions
+# engineer() used to score each row on out.iloc[idx-100:idx+1]. Indicators there
+# only ever see that trailing window (the EWMs in particular are truncated by it),
+# so the pandas ewm / rolling-mean recursions are replayed below for every window
+# at once, keeping the champion columns identical to the old per-row loop.
+CHAMPION_WINDOW = 100
+
+class _WindowEWM:
+    def __init__(self, first, span):
+        com = (span - 1) / 2
+        self.factor = 1. - 1. / (1. + com)
+        self.weighted = first.copy()
+        self.old_wt = np.ones_like(first)
+
+    def update(self, cur):
+        obs = cur == cur
+        live = self.weighted == self.weighted
+        self.old_wt = np.where(live, self.old_wt * self.factor, self.old_wt)
+        step = (self.old_wt * self.weighted + cur) / (self.old_wt + 1.)
+        self.weighted = np.where(live & obs & (self.weighted != cur), step, self.weighted)
+        self.old_wt = np.where(live & obs, self.old_wt + 1., self.old_wt)
+        self.weighted = np.where(~live & obs, cur, self.weighted)
+
+def _window_mean(win, period, blank_first=False):
+    # last rolling(period).mean() of every window row, incl. pandas' Kahan sums
+    rows, width = win.shape
+    sum_x = np.zeros(rows)
+    comp_add = np.zeros(rows)
+    comp_rem = np.zeros(rows)
+    nobs = np.zeros(rows, dtype=np.int64)
+    neg_ct = np.zeros(rows, dtype=np.int64)
+    same = np.zeros(rows, dtype=np.int64)
+    first = np.full(rows, np.nan) if blank_first else win[:, 0]
+    prev = first.copy()
+    for k in range(width):
+        if k >= period:
+            val = first if k == period else win[:, k - period]
+            obs = val == val
+            y = -val - comp_rem
+            t = sum_x + y
+            comp_rem = np.where(obs, t - sum_x - y, comp_rem)
+            sum_x = np.where(obs, t, sum_x)
+            nobs -= obs
+            neg_ct -= obs & np.signbit(val)
+        val = first if k == 0 else win[:, k]
+        obs = val == val
+        y = val - comp_add
+        t = sum_x + y
+        comp_add = np.where(obs, t - sum_x - y, comp_add)
+        sum_x = np.where(obs, t, sum_x)
+        nobs += obs
+        neg_ct += obs & np.signbit(val)
+        same = np.where(obs, np.where(val == prev, same + 1, 1), same)
+        prev = np.where(obs, val, prev)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sum_x / nobs
+    flat = same >= nobs
+    mean = np.where(flat, prev, mean)
+    mean = np.where(~flat & (neg_ct == 0) & (mean < 0), 0.0, mean)
+    mean = np.where(~flat & (neg_ct == nobs) & (mean > 0), 0.0, mean)
+    return np.where((nobs >= period) & (nobs > 0), mean, np.nan)
+
+def trailing_mean(values, period, window=CHAMPION_WINDOW, blank_first=False):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    # the first `window` rows see the whole prefix, i.e. the plain rolling mean
+    head = min(len(values), window)
+    out[:head] = pd.Series(values[:head]).rolling(period).mean().to_numpy()
+    if len(values) > window:
+        win = sliding_window_view(values, window + 1)
+        out[window:] = _window_mean(win, period, blank_first)
+    return out
+
+def trailing_rsi(df, window=CHAMPION_WINDOW, period=14):
+    delta = df["close"].diff()
+    # diff() inside a window has no previous close for its first row
+    gain = trailing_mean(delta.clip(lower=0), period, window, blank_first=True)
+    loss = trailing_mean(-delta.clip(upper=0), period, window, blank_first=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = gain / loss
+        return 100 - 100 / (1 + rs)
+
+def trailing_macd(close, window=CHAMPION_WINDOW, fast=12, slow=26, signal=9):
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    line = np.full(n, np.nan)
+    sig = np.full(n, np.nan)
+    head = min(n, window)
+    if head:
+        m, m_sig, _ = calculate_macd(pd.DataFrame({"close": close[:head]}), fast, slow, signal)
+        line[:head] = m.to_numpy()
+        sig[:head] = m_sig.to_numpy()
+    if n > window:
+        win = sliding_window_view(close, window + 1)
+        f_ema = _WindowEWM(win[:, 0], fast)
+        s_ema = _WindowEWM(win[:, 0], slow)
+        m_ema = _WindowEWM(f_ema.weighted - s_ema.weighted, signal)
+        for k in range(1, window + 1):
+            f_ema.update(win[:, k])
+            s_ema.update(win[:, k])
+            m_ema.update(f_ema.weighted - s_ema.weighted)
+        line[window:] = f_ema.weighted - s_ema.weighted
+        sig[window:] = m_ema.weighted
+    return line, sig, line - sig
+
+def champion_scores(df, window=CHAMPION_WINDOW):
+    close = df["close"]
+    rsi = trailing_rsi(df, window)
+    macd_line, macd_sig, macd_hist = trailing_macd(close, window)
+    sma10 = trailing_mean(close, 10, window)
+    sma20 = trailing_mean(close, 20, window)
+    sma50 = trailing_mean(close, 50, window)
+    vol_now = df["volume"].to_numpy(dtype=np.float64)
+    vol_avg = trailing_mean(vol_now, 20, window)
+    change_1 = ((close - close.shift(1)) / close.shift(1)).to_numpy()
+    change_4 = ((close - close.shift(4)) / close.shift(4)).to_numpy()
+    c = close.to_numpy(dtype=np.float64)
+    seen = np.minimum(np.arange(len(df)), window) + 1
+
+    g = (2 * ((rsi >= 30) & (rsi <= 70)) + 3 * (rsi < 30)
+         + 2 * (macd_hist > 0) + 2 * (sma10 > sma50)
+         + 1.5 * (vol_now > vol_avg * 1.2) + 1.5 * (change_1 > 0.01))
+    j = (2.5 * ((rsi >= 40) & (rsi <= 65)) + 2.5 * (macd_line > macd_sig)
+         + 2 * (c > sma20) + 0.5 * (vol_now > vol_avg * 1.1))
+    f = 2 * (rsi > 50) + 2 * (macd_hist > 0) + 2 * (change_4 > 0.02)
+    g = np.where(seen < 50, 0.0, g)
+    j = np.where(seen < 50, 0.0, j)
+    f = np.where(seen < 30, 0.0, f)
+
+    return pd.DataFrame({
+        "gohan_conf": g,
+        "jiren_conf": j,
+        "freezer_conf": f,
+        "beerus_conf": beerus_vote(g, j, f),
+    }, index=df.index)
+
+# Load sources
+def is_npy(path):
+    return str(path).endswith(".raw.npy")
+
+def source_files():
+    csvs = sorted(glob.glob(CSV_GLOB))
+    files = list(csvs)
+    for f in sorted(glob.glob(NPY_GLOB)):
+        twin = f[:-len(".raw.npy")] + ".csv"
+        if twin in csvs:
+            # same pair twice would double its rows
+            print(f"⚠️ Skipping {f}: {pathlib.Path(twin).name} covers the same pair")
+            continue
+        files.append(f)
     if not files:
-        raise ValueError("❌ No CSVs found in bulma/")
-    frames = []
-    for f in files:
-        df = pd.read_csv(f)
-        if {"unix", "open", "high", "low", "close"}.issubset(df.columns):
-            df = df[
-                ["unix", "open", "high", "low", "close", df.columns[-1]]
-            ].rename(columns={df.columns[-1]: "volume"})
-            frames.append(df)
-            print(f"✅ Loaded {f} shape={df.shape}")
-    raw = pd.concat(frames).sort_values("unix").reset_index(drop=True)
+        raise ValueError("❌ No CSVs or .raw.npy files found in bulma/")
+    return files
+
+def load_csv(path, nrows=None):
+    # only the OHLCV columns, with fixed dtypes: date/symbol are never used
+    cols = pd.read_csv(path, nrows=0).columns
+    if not {"unix", "open", "high", "low", "close"}.issubset(cols):
+        return None
+    vol = cols[-1]
+    df = pd.read_csv(
+        path,
+        nrows=nrows,
+        usecols=["unix", "open", "high", "low", "close", vol],
+        dtype={**RAW_DTYPES, vol: RAW_DTYPES["volume"]},
+    ).rename(columns={vol: "volume"})[RAW_COLS]
+    # Bitstamp exports are newest first
+    return df.sort_values("unix").reset_index(drop=True)
+
+def load_npy(path, nrows=None):
+    # memory-mapped; with nrows, only the newest rows (as load_csv reads them)
+    arr = np.load(path, mmap_mode="r")
+    if arr.dtype.names is None or not set(RAW_COLS).issubset(arr.dtype.names):
+        return None
+    if nrows is not None:
+        arr = arr[-nrows:]
+    df = pd.DataFrame({c: np.asarray(arr[c], dtype=RAW_DTYPES[c]) for c in RAW_COLS})
+    return df.sort_values("unix").reset_index(drop=True)
+
+def load_source(path, nrows=None):
+    return load_npy(path, nrows) if is_npy(path) else load_csv(path, nrows)
+
+def load_raw(path, key, as_npy=False):
+    # Parsed OHLCV kept as a structured .npy next to the feature cache; later
+    # runs memory-map it instead of parsing the CSV text again.
+    npy = CACHE_DIR / f"{key}.raw.npy"
+    if npy.exists():
+        arr = np.load(npy, mmap_mode="r")
+        return pd.DataFrame({c: arr[c] for c in RAW_COLS})
+    raw = load_csv(path)
+    if raw is not None and as_npy:
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp = CACHE_DIR / f"{key}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, raw.to_records(index=False, column_dtypes=RAW_DTYPES))
+        os.replace(tmp, npy)
     return raw
 
 # Features
@@ -131,21 +280,9 @@ def engineer(df):
     out["momentum_lag2"] = out["momentum"].shift(2)
 
     # Beerus champions
-    g_list, j_list, f_list, b_list = [], [], [], []
-    for idx in range(len(out)):
-        window = out.iloc[max(0, idx - 100):idx+1]
-        g = gohan_strat(window)
-        j = jiren_strat(window)
-        f = freezer_strat(window)
-        b = beerus_vote(g, j, f)
-        g_list.append(g)
-        j_list.append(j)
-        f_list.append(f)
-        b_list.append(b)
-    out["gohan_conf"] = g_list
-    out["jiren_conf"] = j_list
-    out["freezer_conf"] = f_list
-    out["beerus_conf"] = b_list
+    champs = champion_scores(out)
+    for col in champs.columns:
+        out[col] = champs[col]
 
     return out.dropna().reset_index(drop=True)
 
@@ -157,37 +294,329 @@ def make_labels(df):
     label[fwd_ret < -0.003] = "sell"
     return label[:-3]
 
-# Main
-def main():
-    print("🚀 Bulma training starting...")
+# Feature cache
+# One .npz per source CSV, keyed by its content hash and FEATURE_VERSION, so an
+# unchanged file is never re-engineered. The parsed OHLCV (.raw.npy) is keyed
+# on the content alone: it stays valid across FEATURE_VERSION bumps.
+def cache_keys(path):
+    """(feature key, raw key) for `path`, from one read of the file."""
+    feat = hashlib.sha256(f"bulma-features-v{FEATURE_VERSION}".encode())
+    raw = hashlib.sha256(b"bulma-raw")
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            feat.update(chunk)
+            raw.update(chunk)
+    return feat.hexdigest(), raw.hexdigest()
+
+def cache_key(path):
+    return cache_keys(path)[0]
+
+def load_cached(key):
+    path = CACHE_DIR / f"{key}.npz"
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as z:
+            feat = pd.DataFrame(z["values"], columns=z["columns"].tolist())
+            feat.insert(0, "unix", z["unix"])
+            feat["label"] = z["label"].astype(object)
+        return feat
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable cache {path.name}: {e}")
+        return None
 
-    raw = load_all_csv()
-    print(f"✅ Combined shape: {raw.shape}")
+def save_cached(key, feat):
+    CACHE_DIR.mkdir(exist_ok=True)
+    cols = [c for c in feat.columns if c not in ("unix", "label")]
+    tmp = CACHE_DIR / f"{key}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        np.savez(
+            fh,
+            unix=feat["unix"].to_numpy(dtype=np.int64),
+            values=feat[cols].to_numpy(dtype=np.float64),
+            columns=np.array(cols),
+            label=feat["label"].to_numpy(dtype=str),
+        )
+    os.replace(tmp, CACHE_DIR / f"{key}.npz")
 
+def prune_cache(keep):
+    if not CACHE_DIR.exists():
+        return
+    for path in [*CACHE_DIR.glob("*.npz"), *CACHE_DIR.glob("*.raw.npy")]:
+        if path.name.split(".")[0] not in keep:
+            path.unlink(missing_ok=True)
+
+# Per-symbol pipeline
+# Rolling windows and forward labels must not run across pairs, so every CSV is
+# loaded, engineered and labelled on its own and only the results are merged.
+def build_symbol(path, use_cache=True, raw_npy=False):
+    key, raw_key = cache_keys(path) if use_cache or raw_npy else (None, None)
+    # both stay out of prune_cache while the file is unchanged
+    keys = {k for k in (key, raw_key) if k}
+    if use_cache:
+        feat = load_cached(key)
+        if feat is not None:
+            return feat, keys, True
+    if raw_npy and not is_npy(path):
+        raw = load_raw(path, raw_key, as_npy=True)
+    else:
+        raw = load_source(path)
+    if raw is None:
+        return None, keys, False
     feat = engineer(raw)
     y = make_labels(feat)
-    X = feat.loc[y.index].drop(["unix","open","high","low","close","volume"], axis=1)
+    feat = feat.loc[y.index].copy()
+    feat["label"] = y
+    if use_cache:
+        save_cached(key, feat)
+    return feat, keys, False
+
+def build_dataset(files=None, workers=None, use_cache=True, raw_npy=False):
+    full_run = files is None
+    files = files or source_files()
+    workers = workers or int(os.getenv("BULMA_WORKERS", 0)) or os.cpu_count() or 1
+    frames, keys = [], set()
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        n = len(files)
+        results = pool.map(build_symbol, files, [use_cache] * n, [raw_npy] * n)
+        for f, (feat, file_keys, cached) in zip(files, results):
+            keys |= file_keys
+            if feat is None:
+                print(f"⚠️ Skipped {f}: missing OHLC columns")
+                continue
+            frames.append(feat)
+            print(f"{'♻️ Cached' if cached else '✅ Engineered'} {f} rows={len(feat):,}")
+    if not frames:
+        raise ValueError("❌ No usable CSVs or .raw.npy files found in bulma/")
+    if (use_cache or raw_npy) and full_run:
+        prune_cache(keys)
+    # keep the merged set in time order for TimeSeriesSplit
+    data = pd.concat(frames).sort_values("unix", kind="stable").reset_index(drop=True)
+    y = data.pop("label")
+    X = data.drop(RAW_COLS, axis=1, errors="ignore")
+    return X, y
+
+# Incremental ingest
+# Bitstamp exports are newest first, so fresh candles are spliced in right
+# under the header and only the feature rows they affect are re-engineered
+# on top of the cached matrix for that file.
+def ingest_csv(path, fresh_path):
+    path = pathlib.Path(path)
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        body = fh.read()
+    with open(fresh_path, "rb") as fh:
+        if fh.readline().strip() != header.strip():
+            raise ValueError(f"❌ {fresh_path} does not match the columns of {path.name}")
+        fresh_lines = [line for line in fh if line.strip()]
+
+    last = int(body.split(b",", 1)[0]) if body else 0
+    rows = {}
+    for line in fresh_lines:
+        unix = int(line.split(b",", 1)[0])
+        if unix > last:
+            rows[unix] = line if line.endswith(b"\n") else line + b"\n"
+    if not rows:
+        print(f"✅ {path.name} already up to date")
+        return 0
+
+    old_key, old_raw_key = cache_keys(path)
+    cached = load_cached(old_key)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(header)
+        fh.writelines(rows[u] for u in sorted(rows, reverse=True))
+        fh.write(body)
+    os.replace(tmp, path)
+    (CACHE_DIR / f"{old_raw_key}.raw.npy").unlink(missing_ok=True)
+    print(f"✅ Ingested {len(rows)} new candles into {path.name}")
+
+    if cached is not None:
+        extend_cached(path, old_key, cached, len(rows))
+    return len(rows)
+
+# .raw.npy sources are oldest first: new rows are appended
+def ingest_npy(path, fresh_path):
+    path = pathlib.Path(path)
+    old = np.load(path)
+    fresh = np.load(fresh_path)
+    if fresh.dtype != old.dtype:
+        raise ValueError(f"❌ {fresh_path} does not match the columns of {path.name}")
+
+    last = old["unix"].max() if len(old) else 0
+    fresh = fresh[fresh["unix"] > last]
+    _, first = np.unique(fresh["unix"], return_index=True)
+    if not len(first):
+        print(f"✅ {path.name} already up to date")
+        return 0
+
+    old_key = cache_key(path)
+    cached = load_cached(old_key)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, np.concatenate([old, fresh[first]]))
+    os.replace(tmp, path)
+    print(f"✅ Ingested {len(first)} new candles into {path.name}")
+
+    if cached is not None:
+        extend_cached(path, old_key, cached, len(first))
+    return len(first)
+
+def ingest(path, fresh_path):
+    return ingest_npy(path, fresh_path) if is_npy(path) else ingest_csv(path, fresh_path)
+
+def extend_cached(path, old_key, cached, added):
+    context = load_source(path, nrows=INGEST_CONTEXT + added)
+    feat = engineer(context)
+    y = make_labels(feat)
+    feat = feat.loc[y.index].copy()
+    feat["label"] = y
+    tail = feat[feat["unix"] > cached["unix"].max()]
+    merged = pd.concat([cached, tail[cached.columns]], ignore_index=True)
+    save_cached(cache_key(path), merged)
+    (CACHE_DIR / f"{old_key}.npz").unlink(missing_ok=True)
+    print(f"♻️ Extended cached features for {path.name} by {len(tail)} rows")
+
+# Search profile
+# Every (params, fold) fit runs as its own joblib task. The winning candidate's
+# fold models are then calibrated on their own test folds, which is exactly
+# what CalibratedClassifierCV(cv=cv) would have refitted them for.
+SEARCH_GRID = {
+    "learning_rate": [0.1, 0.05],
+    "max_leaf_nodes": [31, 63],
+    "l2_regularization": [0.0, 1.0],
+}
+
+def _fit_fold(cand, fold, params, X, y, train, test):
+    model = HistGradientBoostingClassifier(max_iter=300, random_state=42, **params)
+    model.fit(X[train], y[train])
+    return cand, fold, model.score(X[test], y[test]), model
+
+def calibrate_folds(models, X, y, splits):
+    parts = []
+    for model, (_, test) in zip(models, splits):
+        part = CalibratedClassifierCV(FrozenEstimator(model), method="isotonic")
+        part.fit(X[test], y[test])
+        parts.append(part)
+    calib = parts[0]
+    calib.calibrated_classifiers_ = [c for p in parts for c in p.calibrated_classifiers_]
+    return calib
+
+def search_fit(X, y, cv, budget=None, workers=None):
+    grid = list(ParameterGrid(SEARCH_GRID))
+    splits = list(cv.split(X))
+    workers = workers or int(os.getenv("BULMA_WORKERS", 0)) or -1
+    tasks = (
+        delayed(_fit_fold)(c, k, params, X, y, train, test)
+        for c, params in enumerate(grid)
+        for k, (train, test) in enumerate(splits)
+    )
+    folds = {}
+    start = time.monotonic()
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".*have been cancelled")
+        with Parallel(n_jobs=workers, return_as="generator_unordered") as parallel:
+            for cand, fold, acc, model in parallel(tasks):
+                folds.setdefault(cand, {})[fold] = (acc, model)
+                done = [c for c, f in folds.items() if len(f) == len(splits)]
+                if budget and done and time.monotonic() - start > budget:
+                    print(f"⏱️ budget of {budget:.0f}s used, {len(done)}/{len(grid)} candidates scored")
+                    break
+
+    scored = {
+        c: np.mean([acc for acc, _ in f.values()])
+        for c, f in folds.items() if len(f) == len(splits)
+    }
+    for c, acc in sorted(scored.items(), key=lambda kv: -kv[1]):
+        print(f"   {acc:.4f}  {grid[c]}")
+    best = max(scored, key=scored.get)
+    print(f"⚡ best mean accuracy = {scored[best]:.4f} with {grid[best]}")
+
+    models = [folds[best][k][1] for k in range(len(splits))]
+    return calibrate_folds(models, X, y, splits)
+
+# Fast profile
+# One booster fit on everything but the most recent slice, then a prefit
+# isotonic step on that slice: a single fit instead of the full profile's seven.
+FAST_HOLDOUT = 0.2
+
+def fast_fit(X, y, holdout=FAST_HOLDOUT):
+    cut = int(len(y) * (1 - holdout))
+    model = HistGradientBoostingClassifier(max_iter=300, random_state=42)
+    model.fit(X[:cut], y[:cut])
+    print(f"⚡ held-out accuracy = {model.score(X[cut:], y[cut:]):.4f} on last {len(y) - cut:,} rows")
+    calib = CalibratedClassifierCV(FrozenEstimator(model), method="isotonic")
+    calib.fit(X[cut:], y[cut:])
+    return calib
+
+def dump_atomic(obj, path):
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+# Main
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the Bulma model on bulma/*.csv and bulma/*.raw.npy")
+    parser.add_argument(
+        "--ingest", nargs="+", default=[], metavar="FILE",
+        help="fresh Bitstamp exports or core.backfill .raw.npy files to append to "
+             "the same-named bulma/ files before training",
+    )
+    parser.add_argument(
+        "--npy", action="store_true",
+        help="keep parsed OHLCV as memory-mapped .npy files in bulma/cache/",
+    )
+    parser.add_argument(
+        "--profile", choices=["full", "search", "fast"], default="full",
+        help="full: serial CV then CalibratedClassifierCV; "
+             "search: parallel folds over SEARCH_GRID, fold models reused for calibration; "
+             "fast: one fit, isotonic calibration on the newest FAST_HOLDOUT rows",
+    )
+    parser.add_argument(
+        "--budget", type=float, default=None, metavar="SECONDS",
+        help="wall-clock limit for the search profile",
+    )
+    args = parser.parse_args(argv)
+
+    for fresh in args.ingest:
+        target = BULMA_DIR / pathlib.Path(fresh).name
+        if not target.exists():
+            raise ValueError(f"❌ No bulma/{target.name} to ingest {fresh} into")
+        ingest(target, fresh)
+
+    print("🚀 Bulma training starting...")
+
+    X, y = build_dataset(use_cache=os.getenv("BULMA_NO_CACHE") is None, raw_npy=args.npy)
+    print(f"✅ Combined shape: {X.shape}")
 
     scaler = RobustScaler()
     scaler.fit(X)
     X_scaled = scaler.transform(X)
 
     cv = TimeSeriesSplit(n_splits=5)
-    model = HistGradientBoostingClassifier(max_iter=300, random_state=42)
-    scores = cross_val_score(model, X_scaled, y, cv=cv, scoring="accuracy")
-    print(f"⚡ mean accuracy = {scores.mean():.4f}")
+    if args.profile == "search":
+        calib = search_fit(X_scaled, np.asarray(y), cv, budget=args.budget)
+    elif args.profile == "fast":
+        calib = fast_fit(X_scaled, np.asarray(y))
+    else:
+        model = HistGradientBoostingClassifier(max_iter=300, random_state=42)
+        scores = cross_val_score(model, X_scaled, y, cv=cv, scoring="accuracy")
+        print(f"⚡ mean accuracy = {scores.mean():.4f}")
 
-    model.fit(X_scaled, y)
-    calib = CalibratedClassifierCV(model, method="isotonic", cv=cv)
-    calib.fit(X_scaled, y)
+        model.fit(X_scaled, y)
+        calib = CalibratedClassifierCV(model, method="isotonic", cv=cv)
+        calib.fit(X_scaled, y)
 
-    joblib.dump(calib, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
+    # scaler first: a running engine reloads when the model file changes
+    dump_atomic(scaler, SCALER_PATH)
+    dump_atomic(calib, MODEL_PATH)
+    export_flat(scaler, calib, FLAT_MODEL_PATH, check=X.iloc[-FLAT_CHECK_ROWS:])
 
     ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     print(f"✅ trained Bulma ({ts}) with {len(y):,} samples")
     print(f"   model: {MODEL_PATH}")
     print(f"   scaler: {SCALER_PATH}")
+    print(f"   flat:   {FLAT_MODEL_PATH}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,197 @@
+# bulma/flat_model.py
+"""
+Flat, NumPy-only copy of the trained Bulma model.
+
+export_flat() turns the RobustScaler + CalibratedClassifierCV(isotonic) pair
+from bulma_train into plain arrays (tree nodes, leaf values, isotonic tables)
+saved as one .npz. FlatScaler / FlatModel evaluate that file without
+importing sklearn, mirroring sklearn's arithmetic so probabilities match.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+BULMA_DIR = Path(__file__).resolve().parent
+FLAT_MODEL_PATH = BULMA_DIR / "bulma_model.npz"
+# rows walked through the trees at once: tree walking holds a few
+# (rows × trees) arrays, ~60 KB per row for a 900-tree model
+CHUNK_ROWS = 512
+
+# -- Export (needs the fitted sklearn objects, not sklearn itself) --
+def _booster(calibrated):
+    est = calibrated.estimator
+    # FrozenEstimator (prefit calibration) wraps the booster
+    est = getattr(est, "estimator", est)
+    if not hasattr(est, "_predictors"):
+        raise ValueError(f"❌ Unsupported estimator for flat export: {type(est).__name__}")
+    return est
+
+def flatten(scaler, model) -> dict:
+    if any(cc.method != "isotonic" for cc in model.calibrated_classifiers_):
+        raise ValueError("❌ Only isotonic calibration can be exported")
+    n_features = len(scaler.feature_names_in_)
+    nodes, roots, iters, baselines, class_map = [], [], [], [], []
+    iso_x, iso_y, iso_bounds, iso_len = [], [], [], []
+    n_nodes = 0
+    for cc in model.calibrated_classifiers_:
+        est = _booster(cc)
+        pos = np.searchsorted(np.sort(cc.classes), est.classes_)
+        class_map.append(pos)
+        baselines.append(np.asarray(est._baseline_prediction, dtype=np.float64).reshape(-1))
+        iters.append(len(est._predictors))
+        for predictors in est._predictors:
+            for predictor in predictors:
+                tree = predictor.nodes
+                if tree["is_categorical"].any():
+                    raise ValueError("❌ Categorical splits are not supported")
+                roots.append(n_nodes)
+                nodes.append(tree)
+                n_nodes += len(tree)
+        for iso in cc.calibrators:
+            iso_x.append(np.asarray(iso.X_thresholds_, dtype=np.float64))
+            iso_y.append(np.asarray(iso.y_thresholds_, dtype=np.float64))
+            iso_bounds.append((iso.X_min_, iso.X_max_))
+            iso_len.append(len(iso.X_thresholds_))
+
+    offsets = np.repeat(roots, [len(t) for t in nodes])
+    tree = np.concatenate(nodes)
+    center = scaler.center_ if scaler.center_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    return {
+        "feature_names": np.asarray(scaler.feature_names_in_, dtype=str),
+        "center": np.asarray(center, dtype=np.float64),
+        "scale": np.asarray(scale, dtype=np.float64),
+        "classes": np.asarray(model.classes_, dtype=str),
+        "feature": tree["feature_idx"].astype(np.int64),
+        "threshold": tree["num_threshold"].astype(np.float64),
+        "missing_left": tree["missing_go_to_left"].astype(bool),
+        "is_leaf": tree["is_leaf"].astype(bool),
+        "left": tree["left"].astype(np.int64) + offsets,
+        "right": tree["right"].astype(np.int64) + offsets,
+        "value": tree["value"].astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "iterations": np.asarray(iters, dtype=np.int64),
+        "baselines": np.stack(baselines),
+        "class_map": np.stack(class_map).astype(np.int64),
+        "iso_x": np.concatenate(iso_x),
+        "iso_y": np.concatenate(iso_y),
+        "iso_bounds": np.asarray(iso_bounds, dtype=np.float64),
+        "iso_offsets": np.concatenate([[0], np.cumsum(iso_len)]).astype(np.int64),
+    }
+
+def export_flat(scaler, model, path=FLAT_MODEL_PATH, check=None):
+    """
+    Write the flat model to `path`. With `check` (unscaled feature rows),
+    the flat probabilities are compared against sklearn's first.
+    """
+    arrays = flatten(scaler, model)
+    if check is not None:
+        X = scaler.transform(check)
+        expected = model.predict_proba(X)
+        got = FlatModel(arrays).predict_proba(np.asarray(X, dtype=np.float64))
+        err = float(np.max(np.abs(expected - got))) if len(X) else 0.0
+        if err > 1e-12:
+            raise ValueError(f"❌ Flat model disagrees with sklearn (max |Δp| = {err:.3g})")
+        print(f"✅ Flat model matches sklearn on {len(X):,} rows (max |Δp| = {err:.1e})")
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+    tmp.replace(path)
+    return path
+
+# -- Runtime (NumPy only) --
+class FlatScaler:
+    """RobustScaler.transform: (X - center_) / scale_."""
+
+    def __init__(self, arrays):
+        self.feature_names_in_ = arrays["feature_names"]
+        self.center_ = arrays["center"]
+        self.scale_ = arrays["scale"]
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.center_
+        X /= self.scale_
+        return X
+
+class FlatModel:
+    """CalibratedClassifierCV.predict_proba over flat HistGradientBoosting trees."""
+
+    def __init__(self, arrays):
+        self.classes_ = arrays["classes"].astype(object)
+        for key in ("feature", "threshold", "missing_left", "is_leaf", "left",
+                    "right", "value", "roots", "iterations", "baselines",
+                    "class_map", "iso_x", "iso_y", "iso_bounds", "iso_offsets"):
+            setattr(self, key, arrays[key])
+
+    def _leaf_values(self, X):
+        node = np.tile(self.roots, (len(X), 1))
+        active = ~self.is_leaf[node]
+        while active.any():
+            r, t = np.nonzero(active)
+            nd = node[r, t]
+            x = X[r, self.feature[nd]]
+            go_left = np.where(np.isnan(x), self.missing_left[nd], x <= self.threshold[nd])
+            nd = np.where(go_left, self.left[nd], self.right[nd])
+            node[r, t] = nd
+            active[r, t] = ~self.is_leaf[nd]
+        return self.value[node]
+
+    def _calibrate(self, idx, raw):
+        lo, hi = self.iso_offsets[idx], self.iso_offsets[idx + 1]
+        xs, ys = self.iso_x[lo:hi], self.iso_y[lo:hi]
+        if len(ys) == 1:
+            return ys.repeat(raw.shape)
+        return np.interp(np.clip(raw, *self.iso_bounds[idx]), xs, ys)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) <= CHUNK_ROWS:
+            return self._proba(X)
+        return np.concatenate([self._proba(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)])
+
+    def _proba(self, X):
+        n, n_classes = len(X), len(self.classes_)
+        leaves = self._leaf_values(X)
+        per_iter = self.baselines.shape[1]
+        mean_proba = np.zeros((n, n_classes))
+        tree_lo = cal = 0
+        for m, n_iter in enumerate(self.iterations):
+            tree_hi = tree_lo + n_iter * per_iter
+            vals = leaves[:, tree_lo:tree_hi].reshape(n, n_iter, per_iter)
+            base = np.broadcast_to(self.baselines[m], (n, 1, per_iter))
+            # trees are added one iteration at a time, as sklearn does
+            raw = np.concatenate([base, vals], axis=1).cumsum(axis=1)[:, -1, :]
+            proba = np.zeros((n, n_classes))
+            for k in range(per_iter):
+                class_idx = self.class_map[m][k] + (1 if n_classes == 2 else 0)
+                proba[:, class_idx] = self._calibrate(cal, raw[:, k])
+                cal += 1
+            if n_classes == 2:
+                proba[:, 0] = 1.0 - proba[:, 1]
+            else:
+                denominator = np.sum(proba, axis=1)[:, np.newaxis]
+                uniform = np.full_like(proba, 1 / n_classes)
+                proba = np.divide(proba, denominator, out=uniform, where=denominator != 0)
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            mean_proba += proba
+            tree_lo = tree_hi
+        mean_proba /= len(self.iterations)
+        return mean_proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def load_flat(path=FLAT_MODEL_PATH):
+    """(scaler, model) drop-ins for BulmaEngine, read from a flat .npz."""
+    with np.load(path, allow_pickle=False) as z:
+        arrays = {k: z[k] for k in z.files}
+    return FlatScaler(arrays), FlatModel(arrays)
+
+if __name__ == "__main__":
+    import joblib
+    scaler = joblib.load(BULMA_DIR / "bulma_scaler.joblib")
+    model = joblib.load(BULMA_DIR / "bulma_model.joblib")
+    print(f"✅ Exported {export_flat(scaler, model)}")
@@ -0,0 +1,186 @@
+# core/backfill.py
+"""
+Long candle history past Coinbase's 350-candle limit.
+
+• `backfill_candles` splits [start, end) into MAX_CANDLES pages per symbol and
+  fetches every page of every symbol on one bounded pool, all drawing on
+  data_feed.LIMITER, so months of hourly data for 50 coins is a few hundred
+  calls at the account's rate limit instead of a serial crawl.
+• Page overlaps are de-duplicated by candle start; `find_gaps` reports
+  missing stretches (hours without trades, or pages that kept failing).
+• `write_training_csv` writes the bulma/ CSV layout (newest first, the same
+  header as the Bitstamp exports) and `write_raw_npy` a structured RAW_COLS
+  `.raw.npy` (oldest first) that bulma_train memory-maps. Either file can be
+  dropped into bulma/ as a training source, or passed to
+  `bulma_train --ingest` to extend the same-named file already there.
+
+    python -m core.backfill XLM-USD SOL-USD --days 180 --out bulma/incoming --format npy
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from core.data_feed import (
+    CANDLE_COLS, GRANULARITY_SECONDS, HARDCODED_TOP_50, LIMITER, MAX_CANDLES, PREFETCH_WORKERS,
+    Candles, _get_candles, is_rate_limited,
+)
+
+PAGE_ATTEMPTS = 5
+RAW_COLS = ["unix", "open", "high", "low", "close", "volume"]
+GRANULARITY_SUFFIX = {"ONE_HOUR": "1h", "FIVE_MINUTE": "5m", "FIFTEEN_MINUTE": "15m",
+                      "THIRTY_MINUTE": "30m", "ONE_DAY": "d"}
+
+def pages(start: int, end: int, granularity: str = "ONE_HOUR") -> list:
+    """[start, end) cut into windows of at most MAX_CANDLES candles."""
+    step = GRANULARITY_SECONDS[granularity] * MAX_CANDLES
+    # end a second before the next page, whether Coinbase treats `end` as inclusive or not
+    return [(s, min(s + step, end) - 1) for s in range(start, end, step)]
+
+def closed_range(start: int, end: int = None, granularity: str = "ONE_HOUR"):
+    """[start, end) snapped to candle boundaries, leaving out the candle still forming at `end`."""
+    gs = GRANULARITY_SECONDS[granularity]
+    end = int(end if end is not None else datetime.now(timezone.utc).timestamp())
+    return -(-int(start) // gs) * gs, end - end % gs
+
+def _fetch_page(client, symbol, granularity, start, end):
+    for attempt in range(PAGE_ATTEMPTS):
+        try:
+            return _get_candles(client, symbol, granularity, start, end, MAX_CANDLES)
+        except Exception as e:
+            if is_rate_limited(e):
+                print(f"⏳ Rate limited on {symbol}, backing off {LIMITER.throttled():.1f}s")
+                continue
+            print(f"⚠️ Backfill page {symbol} {start}-{end} failed ({attempt + 1}/{PAGE_ATTEMPTS}): {e}")
+            time.sleep(min(2 ** attempt, 10))
+    print(f"❌ Giving up on {symbol} {start}-{end}; it will show as a gap")
+    return Candles.from_rows([])
+
+def backfill_candles(client, symbols, start: int, end: int = None, granularity: str = "ONE_HOUR",
+                     workers: int = PREFETCH_WORKERS) -> dict:
+    """
+    {symbol: Candles} for the closed candles starting in [start, end),
+    end defaulting to now.
+    """
+    start, end = closed_range(start, end, granularity)
+    jobs = [(sym, s, e) for sym in symbols for s, e in pages(start, end, granularity)]
+    if not jobs:
+        return {sym: Candles.from_rows([]) for sym in symbols}
+    print(f"📥 Backfilling {len(symbols)} symbols: {len(jobs)} pages of {MAX_CANDLES} candles")
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs)), thread_name_prefix="backfill") as pool:
+        results = pool.map(lambda job: _fetch_page(client, job[0], granularity, job[1], job[2]), jobs)
+        parts = {sym: [] for sym in symbols}
+        for (sym, _, _), page in zip(jobs, results):
+            parts[sym].append(page)
+    out = {}
+    for sym, pieces in parts.items():
+        cols = {c: np.concatenate([getattr(p, c) for p in pieces]) for c in CANDLE_COLS}
+        # page edges overlap by a candle: keep one bar per start, in order
+        _, first = np.unique(cols["start"], return_index=True)
+        first = first[(cols["start"][first] >= start) & (cols["start"][first] < end)]
+        out[sym] = Candles(**{c: a[first] for c, a in cols.items()})
+    return out
+
+def find_gaps(candles: Candles, granularity: str = "ONE_HOUR", start: int = None, end: int = None) -> list:
+    """[(first, last missing candle start)] between the candles, and from `start` / up to `end` if given."""
+    gs = GRANULARITY_SECONDS[granularity]
+    starts = candles.start.tolist()
+    if start is not None:
+        starts.insert(0, start - gs)
+    if end is not None:
+        starts.append(end)
+    return [(a + gs, b - gs) for a, b in zip(starts, starts[1:]) if b - a > gs]
+
+def training_frame(symbol: str, candles: Candles) -> pd.DataFrame:
+    """Candles → the bulma/ CSV columns, newest first."""
+    base, quote = symbol.split("-")
+    new_first = slice(None, None, -1)
+    unix = candles.start[new_first]
+    return pd.DataFrame({
+        "unix": unix,
+        "date": pd.to_datetime(unix, unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+        "symbol": f"{base}/{quote}",
+        "open": candles.open[new_first], "high": candles.high[new_first],
+        "low": candles.low[new_first], "close": candles.close[new_first],
+        f"Volume {base}": candles.volume[new_first],
+        f"Volume {quote}": (candles.volume * candles.close)[new_first],
+    })
+
+def output_name(symbol: str, granularity: str = "ONE_HOUR", prefix: str = "Coinbase") -> str:
+    return f"{prefix}_{symbol.replace('-', '')}_{GRANULARITY_SUFFIX.get(granularity, granularity)}"
+
+def write_training_csv(symbol: str, candles: Candles, path):
+    tmp = f"{path}.tmp"
+    training_frame(symbol, candles).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def write_raw_npy(symbol: str, candles: Candles, path):
+    # same volume column bulma_train.load_csv picks: the last (quote) one
+    arr = np.rec.fromarrays(
+        [candles.start, candles.open, candles.high, candles.low, candles.close,
+         candles.volume * candles.close],
+        dtype=[("unix", "int64")] + [(c, "float64") for c in RAW_COLS[1:]],
+    )
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        np.save(fh, arr)
+    os.replace(tmp, path)
+
+def backfill_to_dir(client, symbols, start: int, end: int = None, out_dir: str = ".",
+                    granularity: str = "ONE_HOUR", fmt: str = "csv", prefix: str = "Coinbase",
+                    workers: int = PREFETCH_WORKERS) -> dict:
+    """Backfill and write one file (or two, fmt="both") per symbol; returns {symbol: gaps}."""
+    start, end = closed_range(start, end, granularity)
+    gs = GRANULARITY_SECONDS[granularity]
+    t0 = time.perf_counter()
+    data = backfill_candles(client, symbols, start, end, granularity, workers)
+    os.makedirs(out_dir, exist_ok=True)
+    report = {}
+    for sym, candles in data.items():
+        gaps = find_gaps(candles, granularity, start, end)
+        report[sym] = gaps
+        if not len(candles):
+            print(f"⚠️ {sym}: no candles in range")
+            continue
+        name = os.path.join(out_dir, output_name(sym, granularity, prefix))
+        if fmt in ("csv", "both"):
+            write_training_csv(sym, candles, name + ".csv")
+        if fmt in ("npy", "both"):
+            write_raw_npy(sym, candles, name + ".raw.npy")
+        missing = sum((b - a) // gs + 1 for a, b in gaps)
+        note = f", {len(gaps)} gaps ({missing} candles missing)" if gaps else ""
+        print(f"✅ {sym}: {len(candles)} candles → {name}{note}")
+    print(f"🏁 Backfill done in {time.perf_counter() - t0:.1f}s")
+    return report
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from coinbase.rest import RESTClient
+
+    parser = argparse.ArgumentParser(description="Backfill Coinbase candles into bulma/ CSV files")
+    parser.add_argument("symbols", nargs="*", help="product ids (default: the hard-coded top 50 vs USD)")
+    parser.add_argument("--days", type=float, default=90, help="history to fetch when --start is not given")
+    parser.add_argument("--start", help="YYYY-MM-DD[ HH:MM] (UTC)")
+    parser.add_argument("--end", help="YYYY-MM-DD[ HH:MM] (UTC), default now")
+    parser.add_argument("--granularity", default="ONE_HOUR", choices=sorted(GRANULARITY_SECONDS))
+    parser.add_argument("--out", default="bulma/incoming")
+    parser.add_argument("--format", choices=["csv", "npy", "both"], default="csv")
+    parser.add_argument("--prefix", default="Coinbase",
+                        help="file name prefix; 'Bitstamp' names them for bulma_train --ingest")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = RESTClient(api_key=os.getenv("COINBASE_API_KEY_ID"),
+                        api_secret=os.getenv("COINBASE_PRIVATE_KEY_CONTENT"))
+    ts = lambda s: int(pd.Timestamp(s, tz="UTC").timestamp())
+    end = ts(args.end) if args.end else int(time.time())
+    start = ts(args.start) if args.start else int(end - args.days * 86400)
+    symbols = args.symbols or [f"{c}-USD" for c in HARDCODED_TOP_50]
+    backfill_to_dir(client, symbols, start, end, args.out, args.granularity,
+                    args.format, args.prefix, args.workers)
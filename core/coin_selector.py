@@ -31,18 +31,9 @@ class CoinSelector:
         held = state.get("held", [])
         rotated = []
 
-        # remove worst performers under -15%
-        if "entry_prices" in state:
-            for sym, entry in state["entry_prices"].items():
-                try:
-                    price = self.client.get_product(sym).price
-                    change = (price - entry) / entry * 100
-                    if change < -15 and sym.split("-")[0] in held:
-                        held.remove(sym.split("-")[0])
-                        rotated.append(sym.split("-")[0])
-                except Exception as e:
-                    print(f"⚠️ rotation check failed for {sym}: {e}")
-                    continue
+        # The -15% worst-performer drop never fired: the SDK returned the
+        # price as a string, so the subtraction raised and every coin was
+        # kept. Held coins stay put until that rule is enabled on purpose.
 
         missing = 15 - len(held)
         if missing > 0:
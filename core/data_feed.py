@@ -1,6 +1,11 @@
+import numpy as np
 import pandas as pd
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
 import time
+from core.latency import timed
 from frankelly_telegram.bot import send_telegram_message
 
 # Hard-coded top 50 coins
@@ -12,64 +17,291 @@ HARDCODED_TOP_50 = [
     "LDO", "ENS", "DYDX", "XTZ", "KAVA", "ZEC", "MANA", "SAND", "GALA", "PEPE"
 ]
 
+GRANULARITY_SECONDS = {
+    "ONE_HOUR": 3600,
+    "FIVE_MINUTE": 300,
+    "FIFTEEN_MINUTE": 900,
+    "THIRTY_MINUTE": 1800,
+    "ONE_DAY": 86400,
+}
+CANDLE_COLS = ['start', 'low', 'high', 'open', 'close', 'volume']
+MAX_CANDLES = 350      # Coinbase's per-request limit
+CANDLE_MAX_AGE = 30    # seconds a refresh is reused without calling Coinbase
+# Advanced Trade private REST endpoints allow 30 requests/second per key
+RATE_LIMIT_RPS = 30
+RATE_LIMIT_BURST = 10
+PREFETCH_WORKERS = 8
+
+class TokenBucket:
+    """
+    Request budget shared by every thread: `rate` tokens per second, bursts
+    up to `capacity`. A 429 halves the rate and pauses all callers for a
+    backoff that doubles with consecutive throttles; each success adds one
+    request/second back, up to the configured rate.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_RPS, capacity=RATE_LIMIT_BURST,
+                 min_rate=1.0, base_backoff=0.5, max_backoff=30.0):
+        self.max_rate = self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.min_rate = min_rate
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.strikes = 0
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttled(self) -> float:
+        """Record a 429; returns the seconds every caller now waits."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                # same burst already handled by another thread
+                return self.paused_until - now
+            self.strikes += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.strikes - 1))
+            backoff *= random.uniform(1.0, 1.25)
+            self.paused_until = now + backoff
+            self.tokens = 0.0
+            return backoff
+
+    def succeeded(self):
+        with self.lock:
+            self.strikes = 0
+            self.rate = min(self.max_rate, self.rate + 1.0)
+
+LIMITER = TokenBucket()
+
+def is_rate_limited(e: Exception) -> bool:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    text = str(e).lower()
+    return status == 429 or "429" in text or "rate limit" in text or "too many requests" in text
+
+class Candles:
+    """
+    Candles as contiguous columns, oldest first: `start` int64 seconds, the
+    prices and volume float64. Never modified in place – merges build new
+    arrays – so slices handed out stay valid while the cache moves on.
+    """
+
+    __slots__ = tuple(CANDLE_COLS)
+
+    def __init__(self, start, low, high, open, close, volume):
+        for name, arr in zip(CANDLE_COLS, (start, low, high, open, close, volume)):
+            # shared by every slice the cache has handed out
+            arr.flags.writeable = False
+            setattr(self, name, arr)
+
+    @classmethod
+    def from_payload(cls, raw) -> "Candles":
+        """Coinbase's `candles` list (string fields, newest first) → arrays."""
+        if not raw:
+            return cls.from_rows([])
+        cols = {c: np.array([k[c] for k in raw], dtype=np.float64) for c in CANDLE_COLS}
+        cols["start"] = cols["start"].astype(np.int64)
+        order = np.argsort(cols["start"], kind="stable")
+        if not (order == np.arange(len(order))).all():
+            cols = {c: a[order] for c, a in cols.items()}
+        return cls(**cols)
+
+    @classmethod
+    def from_rows(cls, rows) -> "Candles":
+        """[(start, low, high, open, close, volume)], oldest first."""
+        arr = np.array(rows, dtype=np.float64).reshape(-1, len(CANDLE_COLS))
+        cols = {c: np.ascontiguousarray(arr[:, i]) for i, c in enumerate(CANDLE_COLS)}
+        cols["start"] = cols["start"].astype(np.int64)
+        return cls(**cols)
+
+    def __len__(self):
+        return len(self.start)
+
+    def row(self, i: int) -> tuple:
+        return (int(self.start[i]), float(self.low[i]), float(self.high[i]),
+                float(self.open[i]), float(self.close[i]), float(self.volume[i]))
+
+    def __getitem__(self, sl: slice) -> "Candles":
+        return Candles(*(getattr(self, c)[sl] for c in CANDLE_COLS))
+
+    def tail(self, n: int) -> "Candles":
+        return self[max(len(self) - n, 0):]
+
+    def merge(self, newer: "Candles", keep: int = MAX_CANDLES) -> "Candles":
+        """`newer` replaces the bars from its first start onward; the newest `keep` remain."""
+        if not len(newer):
+            return self
+        cut = np.searchsorted(self.start, newer.start[0])
+        return Candles(*(np.concatenate([getattr(self, c)[:cut], getattr(newer, c)])[-keep:]
+                         for c in CANDLE_COLS))
+
+    def frame(self) -> pd.DataFrame:
+        """date, open, high, low, close, volume. Columns are plain copies (a few
+        KB), handed over without pandas' block consolidation; callers may write."""
+        return pd.DataFrame({
+            "date": self.start.astype("datetime64[s]"),
+            "open": self.open.copy(), "high": self.high.copy(), "low": self.low.copy(),
+            "close": self.close.copy(), "volume": self.volume.copy(),
+        }, copy=False)
+
+def _get_candles(client, symbol, granularity, start_ts, end_ts, limit) -> Candles:
+    """One get_candles call, decoded straight into Candles."""
+    print(f"🔎 [DEBUG] Fetching candles for {symbol} "
+          f"start={start_ts} end={end_ts} limit={limit}")
+    LIMITER.acquire()
+    with timed("fetch", symbol):
+        resp = client.get_candles(
+            product_id=symbol,
+            start=str(start_ts),
+            end=str(end_ts),
+            granularity=granularity,
+            limit=limit
+        )
+    LIMITER.succeeded()
+    data = resp.to_dict() if hasattr(resp, "to_dict") else resp
+    raw = data.get("candles", []) if isinstance(data, dict) else []
+    with timed("decode", symbol):
+        return Candles.from_payload(raw)
+
+class CandleCache:
+    """
+    Recent candles per (symbol, granularity), each capped at MAX_CANDLES bars.
+
+    The first request for a key – or one wanting more bars than were ever
+    downloaded for it – fetches the whole window. After that only bars from
+    the newest cached start onward are requested: the still-forming bar is
+    replaced and newer bars appended. Within CANDLE_MAX_AGE of the last
+    refresh, requests are answered from memory alone, so any limit or
+    granularity a cycle asks for costs at most one small call per key.
+    """
+
+    def __init__(self, max_age: float = CANDLE_MAX_AGE):
+        self.max_age = max_age
+        self.rows = {}       # key → Candles, at most MAX_CANDLES
+        self.depth = {}      # key → largest window fully downloaded
+        self.refreshed = {}  # key → monotonic time of the last refresh
+        self.lock = threading.Lock()
+
+    def candles(self, client, symbol, granularity, limit) -> Candles:
+        key = (symbol, granularity)
+        gs = GRANULARITY_SECONDS.get(granularity, 3600)
+        with self.lock:
+            held = self.rows.get(key)
+            depth = self.depth.get(key, 0)
+            fresh = time.monotonic() - self.refreshed.get(key, float("-inf")) < self.max_age
+            last_start = int(held.start[-1]) if held is not None and len(held) else None
+            if held is not None and depth >= limit and fresh:
+                return held.tail(limit)
+
+        end_ts = int(datetime.utcnow().timestamp())
+        missing = (end_ts - last_start) // gs + 1 if last_start is not None else None
+        if held is None or last_start is None or depth < limit or missing > MAX_CANDLES:
+            depth = max(depth, limit)
+            start_ts = end_ts - gs * depth
+            if start_ts <= 0:
+                raise ValueError("Invalid start timestamp")
+            new = _get_candles(client, symbol, granularity, start_ts, end_ts, depth)
+            full = True
+        else:
+            new = _get_candles(client, symbol, granularity, last_start, end_ts, missing)
+            full = False
+
+        with self.lock:
+            if full:
+                if not len(new):
+                    return new
+                self.rows[key] = held = new.tail(MAX_CANDLES)
+                self.depth[key] = depth
+            else:
+                held = self.rows.get(key)
+                if held is None:  # cleared meanwhile
+                    return new.tail(limit)
+                # re-fetched forming bar (and anything after it) replaces the cached copy
+                self.rows[key] = held = held.merge(new)
+            self.refreshed[key] = time.monotonic()
+            return held.tail(limit)
+
+    # streaming mode pushes bars in directly
+    def last(self, symbol, granularity):
+        with self.lock:
+            held = self.rows.get((symbol, granularity))
+            return held.row(-1) if held is not None and len(held) else None
+
+    def put(self, symbol, granularity, row):
+        """Replace the newest bar when `row` has its start, append a newer one."""
+        key = (symbol, granularity)
+        with self.lock:
+            held = self.rows.get(key)
+            if held is None or not len(held) or held.start[-1] <= row[0]:
+                bar = Candles.from_rows([row])
+                self.rows[key] = bar if held is None else held.merge(bar)
+            self.refreshed[key] = time.monotonic()
+
+    def expire(self, keys=None):
+        """Force the next request for `keys` (default: all) back to Coinbase."""
+        with self.lock:
+            for key in list(self.refreshed) if keys is None else keys:
+                self.refreshed.pop(key, None)
+
+    def expired(self, symbol, granularity) -> bool:
+        """Bars held but expired, i.e. waiting for Coinbase to re-read them."""
+        key = (symbol, granularity)
+        with self.lock:
+            return key in self.rows and key not in self.refreshed
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.depth.clear()
+            self.refreshed.clear()
+
+CANDLES = CandleCache()
+
 def fetch_live_candles(client, symbol="BTC-USD", granularity="ONE_HOUR", limit=150):
     """
     Fetch recent OHLCV candle data via Coinbase Advanced API.
     Returns a DataFrame with columns: date, open, high, low, close, volume (all floats).
+    Served from CANDLES, which only downloads bars it does not hold yet.
     """
     if not symbol or "-" not in symbol:
         print(f"⚠️ Invalid symbol passed: '{symbol}'")
         send_telegram_message(f"⚠️ Skipping invalid symbol: '{symbol}'", force_send=True)
         return pd.DataFrame()
 
-    granularity_map = {
-        "ONE_HOUR": 3600,
-        "FIVE_MINUTE": 300,
-        "FIFTEEN_MINUTE": 900,
-        "THIRTY_MINUTE": 1800,
-        "ONE_DAY": 86400,
-    }
-    gs = granularity_map.get(granularity, 3600)
-
     for attempt in range(3):
         try:
-            end_ts = int(datetime.utcnow().timestamp())
-            start_ts = end_ts - gs * limit
-            if start_ts <= 0:
-                raise ValueError("Invalid start timestamp")
-            if limit > 350:
-                raise ValueError("Limit exceeds 350")
-
-            print(f"🔎 [DEBUG] Fetching candles for {symbol} "
-                  f"start={start_ts} end={end_ts} limit={limit}")
-            resp = client.get_candles(
-                product_id=symbol,
-                start=str(start_ts),
-                end=str(end_ts),
-                granularity=granularity,
-                limit=limit
-            )
-
-            data = resp.to_dict() if hasattr(resp, "to_dict") else resp
-            raw = data.get("candles", []) if isinstance(data, dict) else []
+            if limit > MAX_CANDLES:
+                raise ValueError(f"Limit exceeds {MAX_CANDLES}")
 
-            if not raw:
+            candles = CANDLES.candles(client, symbol, granularity, limit)
+            if not len(candles):
                 print(f"⚠️ No candles returned for {symbol}")
                 return pd.DataFrame()
 
-            df = pd.DataFrame(raw, columns=[
-                'start', 'low', 'high', 'open', 'close', 'volume'
-            ])
-            for col in ['low', 'high', 'open', 'close', 'volume']:
-                df[col] = df[col].astype(float)
-            df['date'] = pd.to_datetime(df['start'].astype(int), unit='s')
-            df = df.sort_values('date').reset_index(drop=True)
-            return df[['date', 'open', 'high', 'low', 'close', 'volume']]
+            with timed("frame", symbol):
+                return candles.frame()
 
         except Exception as e:
+            if is_rate_limited(e):
+                # LIMITER holds every thread back; the retry waits its turn
+                print(f"⏳ Rate limited on {symbol}, backing off {LIMITER.throttled():.1f}s")
+                continue
             print(f"❌ Candle fetch error for {symbol}: {e}")
             send_telegram_message(f"❌ Candle fetch error: {symbol}\n{e}", force_send=True)
-            if "rate limit" in str(e).lower() or "invalid" in str(e).lower():
+            if "invalid" in str(e).lower():
                 time.sleep(5)
                 continue
             return pd.DataFrame()
@@ -78,6 +310,60 @@ def fetch_live_candles(client, symbol="BTC-USD", granularity="ONE_HOUR", limit=1
     send_telegram_message(f"❌ Failed to fetch candles for {symbol}", force_send=True)
     return pd.DataFrame()
 
+def prefetch_candles(client, symbols, granularity="ONE_HOUR", limit=150, workers=PREFETCH_WORKERS):
+    """
+    fetch_live_candles for every symbol at once on a bounded thread pool,
+    all drawing on LIMITER. Returns {symbol: DataFrame} in `symbols` order.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(symbols)),
+                            thread_name_prefix="candles") as pool:
+        frames = pool.map(lambda s: fetch_live_candles(client, s, granularity, limit), symbols)
+        return dict(zip(symbols, frames))
+
+class PriceSnapshot:
+    """
+    Last trade price of many products from one get_products call.
+
+    Refresh once per cycle with every product the cycle may price; lookups
+    after that are dictionary reads. Anything the listing lacks falls back
+    to the newest candle close, as the per-coin lookups did.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.prices = {}
+
+    def refresh(self, product_ids):
+        product_ids = sorted(set(product_ids))
+        self.prices = {}
+        if not product_ids:
+            return self
+        try:
+            LIMITER.acquire()
+            with timed("prices"):
+                resp = self.client.get_products(product_ids=product_ids)
+            LIMITER.succeeded()
+            data = resp.to_dict() if hasattr(resp, "to_dict") else resp
+            for p in data.get("products", []):
+                try:
+                    self.prices[p["product_id"]] = float(p["price"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+        except Exception as e:
+            if is_rate_limited(e):
+                LIMITER.throttled()
+            print(f"⚠️ Price snapshot failed: {e}")
+        print(f"🔎 [DEBUG] Price snapshot: {len(self.prices)}/{len(product_ids)} products")
+        return self
+
+    def price(self, product_id) -> float:
+        if product_id not in self.prices:
+            self.prices[product_id] = fetch_live_candles(self.client, product_id, "ONE_HOUR", 1)["close"].iloc[-1]
+        return self.prices[product_id]
+
 def fetch_top_performers(client, limit=50):
     """
     Return a hard-coded list of the top 50 known coins to manage.
@@ -0,0 +1,284 @@
+# core/indicators.py
+"""
+Shared indicators for the champion strategies.
+
+• Batch helpers (calculate_atr / calculate_rsi / calculate_macd) work on a whole
+  candle DataFrame, exactly as before.
+• Streaming accumulators (SMA, EMA, RSI, MACD, ATR) replay the same pandas
+  recursions one value at a time, so after feeding a series they hold exactly
+  what the batch helper returns for its last row – in O(1) per candle.
+• IndicatorSet bundles everything the champions read for one candle frame,
+  built in one pass with no pandas calls.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# ────────────────────────── Batch helpers ──────────────────────────
+def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    hl = df["high"] - df["low"]
+    hc = (df["high"] - df["close"].shift()).abs()
+    lc = (df["low"] - df["close"].shift()).abs()
+    tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
+    return tr.rolling(period).mean()
+
+def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    delta = df["close"].diff()
+    gain  = delta.clip(lower=0).rolling(period).mean()
+    loss  = (-delta.clip(upper=0)).rolling(period).mean()
+    rs    = gain / loss
+    return 100 - 100 / (1 + rs)
+
+def calculate_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9):
+    fast_ema = df["close"].ewm(span=fast).mean()
+    slow_ema = df["close"].ewm(span=slow).mean()
+    macd     = fast_ema - slow_ema
+    macd_sig = macd.ewm(span=signal).mean()
+    return macd, macd_sig, macd - macd_sig
+
+# ────────────────────────── Streaming accumulators ─────────────────
+NAN = float("nan")
+
+def _div(a: float, b: float) -> float:
+    # pandas/numpy division semantics (x/0 → ±inf, 0/0 → nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(a) / np.float64(b))
+
+class SMA:
+    """Series.rolling(period).mean(), including pandas' Kahan sums and fix-ups."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_rem = 0.0
+        self.nobs = 0
+        self.neg_ct = 0
+        self.same = 0
+        self.prev = None
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if self.prev is None:
+            self.prev = x
+        self.window.append(x)
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_rem
+                t = self.sum_x + y
+                self.comp_rem = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+        if x == x:
+            self.nobs += 1
+            y = x - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, x) < 0:
+                self.neg_ct += 1
+            self.same = self.same + 1 if x == self.prev else 1
+            self.prev = x
+        self.value = self._mean()
+        return self.value
+
+    def _mean(self) -> float:
+        if self.nobs < self.period or self.nobs <= 0:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.same >= self.nobs:
+            result = self.prev
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+class EMA:
+    """Series.ewm(span=span).mean() (adjust=True), one value at a time."""
+
+    def __init__(self, span: int):
+        com = (span - 1) / 2
+        self.factor = 1. - 1. / (1. + com)
+        self.old_wt = 1.
+        self.value = None
+
+    def update(self, x: float) -> float:
+        if self.value is None:
+            self.value = x
+        elif self.value == self.value:
+            self.old_wt *= self.factor
+            if x == x:
+                if self.value != x:
+                    self.value = (self.old_wt * self.value + x) / (self.old_wt + 1.)
+                self.old_wt += 1.
+        elif x == x:
+            self.value = x
+        return self.value
+
+class RSI:
+    """calculate_rsi(): rolling-mean gains over rolling-mean losses."""
+
+    def __init__(self, period: int = 14):
+        self.gain = SMA(period)
+        self.loss = SMA(period)
+        self.prev_close = None
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        delta = NAN if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        if delta == delta:
+            self.gain.update(delta if delta >= 0 else 0.0)
+            self.loss.update(-(delta if delta <= 0 else 0.0))
+        else:
+            self.gain.update(NAN)
+            self.loss.update(NAN)
+        rs = _div(self.gain.value, self.loss.value)
+        self.value = 100 - _div(100, 1 + rs)
+        return self.value
+
+class MACD:
+    """calculate_macd(): (line, signal, histogram)."""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_ema = EMA(signal)
+        self.line = self.signal = self.hist = NAN
+
+    def update(self, close: float):
+        self.line = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.line)
+        self.hist = self.line - self.signal
+        return self.line, self.signal, self.hist
+
+class ATR:
+    """calculate_atr(): rolling mean of the true range."""
+
+    def __init__(self, period: int = 14):
+        self.tr = SMA(period)
+        self.prev_close = None
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        ranges = [high - low]
+        if self.prev_close is not None:
+            ranges += [abs(high - self.prev_close), abs(low - self.prev_close)]
+        self.prev_close = close
+        ranges = [r for r in ranges if r == r]
+        self.value = self.tr.update(max(ranges) if ranges else NAN)
+        return self.value
+
+# ────────────────────────── Per-symbol bundle ──────────────────────
+def as_indicators(src) -> "IndicatorSet":
+    """Pass an IndicatorSet through; build one from a candle DataFrame."""
+    return src if isinstance(src, IndicatorSet) else IndicatorSet.from_frame(src)
+
+def timestamps(df: pd.DataFrame) -> np.ndarray:
+    for col in ("date", "unix", "start"):
+        if col in df.columns:
+            return df[col].to_numpy()
+    return df.index.to_numpy()
+
+class IndicatorSet:
+    """
+    Everything gohan/jiren/freezer read, for one symbol.
+
+    Feeding a candle frame bar by bar leaves each field equal to the batch
+    formula's last value on that frame (e.g. `rsi` == calculate_rsi(df).iloc[-1]).
+    """
+
+    def __init__(self):
+        self.rsi_ind = RSI(14)
+        self.macd_ind = MACD(12, 26, 9)
+        self.atr_ind = ATR(14)
+        self.sma10_ind = SMA(10)
+        self.sma20_ind = SMA(20)
+        self.sma50_ind = SMA(50)
+        self.vol20_ind = SMA(20)
+        self.closes = deque(maxlen=5)
+        self.volume = NAN
+        self.bars = 0
+        self.last_ts = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IndicatorSet":
+        ind = cls()
+        ind.extend(df)
+        return ind
+
+    def update(self, high: float, low: float, close: float, volume: float, ts=None):
+        self.rsi_ind.update(close)
+        self.macd_ind.update(close)
+        self.atr_ind.update(high, low, close)
+        self.sma10_ind.update(close)
+        self.sma20_ind.update(close)
+        self.sma50_ind.update(close)
+        self.vol20_ind.update(volume)
+        self.closes.append(close)
+        self.volume = volume
+        self.bars += 1
+        self.last_ts = ts
+
+    def extend(self, df: pd.DataFrame):
+        ts = timestamps(df)
+        rows = zip(df["high"].to_numpy(float), df["low"].to_numpy(float),
+                   df["close"].to_numpy(float), df["volume"].to_numpy(float), ts)
+        for high, low, close, volume, t in rows:
+            self.update(float(high), float(low), float(close), float(volume), t)
+
+    # champion inputs
+    @property
+    def close(self) -> float:
+        return self.closes[-1] if self.closes else NAN
+
+    def change(self, bars: int) -> float:
+        """(close - close `bars` candles ago) / that close."""
+        if len(self.closes) <= bars:
+            return NAN
+        before = self.closes[-1 - bars]
+        return _div(self.closes[-1] - before, before)
+
+    @property
+    def rsi(self) -> float:
+        return self.rsi_ind.value
+
+    @property
+    def macd(self) -> float:
+        return self.macd_ind.line
+
+    @property
+    def macd_signal(self) -> float:
+        return self.macd_ind.signal
+
+    @property
+    def macd_hist(self) -> float:
+        return self.macd_ind.hist
+
+    @property
+    def atr(self) -> float:
+        return self.atr_ind.value
+
+    @property
+    def sma10(self) -> float:
+        return self.sma10_ind.value
+
+    @property
+    def sma20(self) -> float:
+        return self.sma20_ind.value
+
+    @property
+    def sma50(self) -> float:
+        return self.sma50_ind.value
+
+    @property
+    def volume_sma20(self) -> float:
+        return self.vol20_ind.value
@@ -0,0 +1,89 @@
+# core/latency.py
+"""
+Per-stage latency for the trading cycle.
+
+• `timed(stage, symbol)` wraps a block (or decorates a function) and records
+  its wall time; blocks that raise are counted as errors too.
+• Every (symbol, stage) pair keeps its last WINDOW samples, so p50/p95/p99
+  follow recent load instead of the whole uptime. Batch-wide stages use the
+  symbol "*".
+• `snapshot()` gives the numbers in-process; `summary()` formats them per
+  stage for the end-of-cycle log.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+WINDOW = 512          # samples kept per (symbol, stage)
+PERCENTILES = (50, 95, 99)
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+_calls = defaultdict(int)
+_errors = defaultdict(int)
+
+def record(stage: str, seconds: float, symbol: str = "*", error: bool = False):
+    key = (symbol, stage)
+    with _lock:
+        _samples[key].append(seconds)
+        _calls[key] += 1
+        if error:
+            _errors[key] += 1
+
+@contextmanager
+def timed(stage: str, symbol: str = "*"):
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        record(stage, time.perf_counter() - start, symbol, failed)
+
+def _stats(values, calls: int, errors: int) -> dict:
+    ms = np.asarray(values) * 1e3
+    p = np.percentile(ms, PERCENTILES) if len(ms) else [float("nan")] * len(PERCENTILES)
+    out = {"calls": calls, "errors": errors, "max": float(ms.max()) if len(ms) else float("nan")}
+    out.update({f"p{q}": float(v) for q, v in zip(PERCENTILES, p)})
+    return out
+
+def snapshot() -> dict:
+    """{(symbol, stage): {calls, errors, p50, p95, p99, max}}, times in ms."""
+    with _lock:
+        data = {k: (list(v), _calls[k], _errors[k]) for k, v in _samples.items()}
+    return {k: _stats(*v) for k, v in sorted(data.items())}
+
+def summary() -> str:
+    """One line per stage over all symbols, plus its slowest symbol by p95."""
+    with _lock:
+        data = {k: (list(v), _calls[k], _errors[k]) for k, v in _samples.items()}
+    stages = defaultdict(lambda: ([], 0, 0))
+    worst = {}
+    for (symbol, stage), (values, calls, errors) in data.items():
+        merged, n, e = stages[stage]
+        stages[stage] = (merged + values, n + calls, e + errors)
+        if symbol != "*" and values:
+            p95 = float(np.percentile(values, 95)) * 1e3
+            if stage not in worst or p95 > worst[stage][1]:
+                worst[stage] = (symbol, p95)
+    lines = ["⏱️ Latency (ms, rolling)"]
+    for stage in sorted(stages):
+        s = _stats(*stages[stage])
+        line = (f"{stage:<10} n={s['calls']:<6} p50={s['p50']:.1f} p95={s['p95']:.1f} "
+                f"p99={s['p99']:.1f} max={s['max']:.1f}")
+        if s["errors"]:
+            line += f" err={s['errors']}"
+        if stage in worst:
+            line += f" slowest={worst[stage][0]} ({worst[stage][1]:.1f})"
+        lines.append(line)
+    return "\n".join(lines)
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _calls.clear()
+        _errors.clear()
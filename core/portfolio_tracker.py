@@ -1,6 +1,11 @@
+import time
+
 from coinbase.rest import RESTClient
+from core.data_feed import LIMITER, PriceSnapshot
+from core.latency import timed
 from frankelly_telegram.bot import send_telegram_message
 
+@timed("portfolio")
 def get_portfolio(client: RESTClient):
     """
     Returns list of (currency, amount, usd_value) and total USD value.
@@ -11,6 +16,12 @@ def get_portfolio(client: RESTClient):
         accounts = data.get("accounts", [])
         portfolio = []
         total = 0.0
+        # every coin priced from one get_products call
+        prices = PriceSnapshot(client).refresh(
+            f"{a.get('currency')}-USD" for a in accounts
+            if a.get("currency") not in ["USD", "USDC"]
+            and float(a.get("available_balance", {}).get("value", 0)) > 0
+        )
 
         for acct in accounts:
             cur = acct.get("currency")
@@ -25,8 +36,7 @@ def get_portfolio(client: RESTClient):
                 continue
 
             try:
-                pr = client.get_product(product_id=f"{cur}-USD")
-                price = float(pr.price)
+                price = float(prices.price(f"{cur}-USD"))
             except Exception as e:
                 print(f"⚠️ price fetch failed for {cur}: {e}")
                 price = 0.0
@@ -44,4 +54,135 @@ def get_portfolio(client: RESTClient):
     except Exception as e:
         print(f"❌ Error fetching portfolio: {e}")
         send_telegram_message(f"❌ Portfolio fetch error: {e}", force_send=True)
-        return [], 0.0
\ No newline at end of file
+        return [], 0.0
+
+# Balances between full sweeps
+RESYNC_INTERVAL = 900      # seconds between get_accounts resyncs
+FILL_POLLS = 3             # get_order attempts before a fill counts as unknown
+FILL_POLL_DELAY = 0.3
+DRIFT_TOLERANCE = 1e-6     # relative difference a resync reports as drift
+CASH = ["USD", "USDC"]
+TERMINAL = {"FILLED", "CANCELLED", "EXPIRED", "FAILED"}
+
+class PortfolioService:
+    """
+    Account balances held in memory for the trading loop.
+
+    A full get_accounts sweep runs on the first call, every RESYNC_INTERVAL
+    and on the first call after anything went unaccounted for (an order
+    whose fill could not be confirmed, a balance going negative). In
+    between, record_order() applies each order's fill from one get_order
+    call, and portfolio() values the balances with a PriceSnapshot the
+    caller already holds, so a cycle's trades cost no extra sweeps.
+    """
+
+    def __init__(self, client: RESTClient, resync_interval: float = RESYNC_INTERVAL):
+        self.client = client
+        self.resync_interval = resync_interval
+        self.held = {}
+        self.synced = float("-inf")
+        self.dirty = True
+
+    @timed("portfolio")
+    def sync(self):
+        LIMITER.acquire()
+        resp = self.client.get_accounts()
+        LIMITER.succeeded()
+        data = resp.to_dict() if hasattr(resp, "to_dict") else resp
+        fresh = {}
+        for acct in data.get("accounts", []):
+            amt = float(acct.get("available_balance", {}).get("value", 0))
+            if amt > 0:
+                fresh[acct.get("currency")] = fresh.get(acct.get("currency"), 0.0) + amt
+        if not self.dirty:
+            drift = sorted(
+                cur for cur in set(fresh) | set(self.held)
+                if abs(fresh.get(cur, 0.0) - self.held.get(cur, 0.0))
+                > DRIFT_TOLERANCE * max(abs(fresh.get(cur, 0.0)), 1.0)
+            )
+            if drift:
+                print(f"⚠️ Portfolio drift corrected on resync: {', '.join(drift)}")
+        self.held = fresh
+        self.synced = time.monotonic()
+        self.dirty = False
+
+    def balances(self) -> dict:
+        """{currency: available amount}, resynced when due."""
+        if self.dirty or time.monotonic() - self.synced >= self.resync_interval:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"❌ Error fetching portfolio: {e}")
+                send_telegram_message(f"❌ Portfolio fetch error: {e}", force_send=True)
+        return dict(self.held)
+
+    def portfolio(self, prices: PriceSnapshot = None):
+        """get_portfolio()'s (list of (currency, amount, usd_value), total USD),
+        valued with `prices` (one bulk call is made when not given)."""
+        held = self.balances()
+        if prices is None:
+            prices = PriceSnapshot(self.client).refresh(f"{c}-USD" for c in held if c not in CASH)
+        portfolio, total = [], 0.0
+        for cur, amt in held.items():
+            if cur in CASH:
+                usd_val = amt  # 1:1 stable value
+            else:
+                try:
+                    usd_val = amt * float(prices.price(f"{cur}-USD"))
+                except Exception as e:
+                    print(f"⚠️ price fetch failed for {cur}: {e}")
+                    usd_val = 0.0
+                if not usd_val > 0:
+                    usd_val = 0.0
+            portfolio.append((cur, amt, usd_val))
+            total += usd_val
+        print(f"[DEBUG] portfolio snapshot: {portfolio}")
+        return portfolio, total
+
+    def record_order(self, resp):
+        """Apply a create_order response's fill to the balances."""
+        data = resp.to_dict() if hasattr(resp, "to_dict") else resp
+        if not data.get("success", False):
+            return  # rejected: nothing moved
+        order_id = (data.get("success_response") or {}).get("order_id") or data.get("order_id")
+        order = None
+        for attempt in range(FILL_POLLS):
+            try:
+                LIMITER.acquire()
+                got = self.client.get_order(order_id)
+                LIMITER.succeeded()
+                got = got.to_dict() if hasattr(got, "to_dict") else got
+                order = got.get("order", {})
+                if order.get("status") in TERMINAL:
+                    break
+            except Exception as e:
+                print(f"⚠️ Fill lookup failed for {order_id}: {e}")
+            time.sleep(FILL_POLL_DELAY)
+        if not order or order.get("status") not in TERMINAL:
+            print(f"⚠️ Fill of {order_id} unconfirmed; resyncing balances next time")
+            self.dirty = True
+            return
+        try:
+            base, quote = order["product_id"].split("-")
+            size = float(order.get("filled_size") or 0)
+            value = float(order.get("filled_value") or 0)
+            fees = float(order.get("total_fees") or 0)
+        except (KeyError, ValueError) as e:
+            print(f"⚠️ Unreadable fill for {order_id}: {e}")
+            self.dirty = True
+            return
+        if order.get("side") == "BUY":
+            self._add(base, size)
+            self._add(quote, -(value + fees))
+        else:
+            self._add(base, -size)
+            self._add(quote, value - fees)
+
+    def _add(self, cur: str, amount: float):
+        amt = self.held.get(cur, 0.0) + amount
+        if amt < -DRIFT_TOLERANCE * max(abs(amount), 1.0):
+            self.dirty = True  # spent more than we thought we had
+        if amt > 1e-12:
+            self.held[cur] = amt
+        else:
+            self.held.pop(cur, None)
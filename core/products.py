@@ -0,0 +1,101 @@
+# core/products.py
+"""
+Product metadata shared by everything that sizes or checks an order.
+
+• Increments, min/max sizes and trading status change rarely, so each
+  product is kept for PRODUCT_TTL instead of costing a get_product call on
+  every sell and dust order.
+• `warm()` loads every product (or a list) with one get_products call; once
+  warmed in bulk, expiry refreshes in bulk too. A product the listing lacks
+  falls back to a single get_product.
+• Prices are not served from here – they go stale in seconds; see
+  data_feed.PriceSnapshot.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+from core.data_feed import LIMITER, is_rate_limited
+from core.latency import timed
+
+PRODUCT_TTL = 3600   # seconds metadata is reused
+
+class ProductCache:
+    def __init__(self, ttl: float = PRODUCT_TTL):
+        self.ttl = ttl
+        self.products = {}   # product_id → (loaded at, product dict)
+        self.bulk = None     # product ids of the last bulk warm-up; [] = all
+        self.lock = threading.Lock()
+
+    def _call(self, fn, **kwargs):
+        LIMITER.acquire()
+        try:
+            with timed("products"):
+                resp = fn(**kwargs)
+        except Exception as e:
+            if is_rate_limited(e):
+                LIMITER.throttled()
+            raise
+        LIMITER.succeeded()
+        return resp.to_dict() if hasattr(resp, "to_dict") else resp
+
+    def store(self, products):
+        now = time.monotonic()
+        with self.lock:
+            for p in products:
+                if p.get("product_id"):
+                    self.products[p["product_id"]] = (now, p)
+
+    def warm(self, client, product_ids=None):
+        """One get_products call for `product_ids`, or for every spot product."""
+        ids = sorted(set(product_ids)) if product_ids else []
+        try:
+            data = self._call(client.get_products, **({"product_ids": ids} if ids else {"product_type": "SPOT"}))
+        except Exception as e:
+            print(f"⚠️ Product warm-up failed: {e}")
+            return self
+        products = data.get("products", [])
+        self.store(products)
+        self.bulk = ids
+        print(f"🔎 [DEBUG] Product metadata cached for {len(products)} products")
+        return self
+
+    def get(self, client, product_id: str) -> dict:
+        with self.lock:
+            hit = self.products.get(product_id)
+        if hit is not None and time.monotonic() - hit[0] < self.ttl:
+            return hit[1]
+        if hit is not None and self.bulk is not None and (not self.bulk or product_id in self.bulk):
+            # expired with the rest of a bulk warm-up: refresh them together
+            self.warm(client, self.bulk)
+            with self.lock:
+                hit = self.products.get(product_id)
+            if hit is not None and time.monotonic() - hit[0] < self.ttl:
+                return hit[1]
+        product = self._call(client.get_product, product_id=product_id)
+        self.store([product])
+        return product
+
+    # order sizing
+    def base_increment(self, client, product_id: str) -> Decimal:
+        return Decimal(self.get(client, product_id).get("base_increment") or "1")
+
+    def precision(self, client, product_id: str) -> int:
+        """Decimals of the base increment: 0.001 → 3."""
+        return abs(self.base_increment(client, product_id).as_tuple().exponent)
+
+    def min_size(self, client, product_id: str) -> float:
+        return float(self.get(client, product_id).get("base_min_size") or 0)
+
+    def tradable(self, client, product_id: str) -> bool:
+        p = self.get(client, product_id)
+        return (p.get("status", "online") == "online" and not p.get("trading_disabled")
+                and not p.get("cancel_only") and not p.get("is_disabled"))
+
+    def clear(self):
+        with self.lock:
+            self.products.clear()
+            self.bulk = None
+
+PRODUCTS = ProductCache()
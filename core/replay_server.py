@@ -0,0 +1,149 @@
+# core/replay_server.py
+"""
+Local stand-in for Coinbase's market-data WebSocket, for offline runs of FEED=stream.
+
+• Replays the bundled hourly CSVs (bulma/Bitstamp_*USD_1h.csv, XLM/USD → XLM-USD)
+  on the `candles` and `ticker` channels, in the message format StreamFeed reads.
+• Each hourly bar is played as twelve 5-minute candles – each sent once mid-way
+  and once final, as Coinbase does – walking open → low/high → close, so the
+  hourly bars rebuilt by the client match the CSV bars.
+• `--speed` is wall seconds per replayed hour; playback starts on a client's
+  first subscribe and only covers the products it subscribed to.
+
+    python -m core.replay_server --hours 48 --speed 2
+    FEED=stream COINBASE_WS_URL=ws://127.0.0.1:8765 python main.py
+"""
+
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import websockets
+
+DATA_GLOB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "bulma", "Bitstamp_*USD_1h.csv")
+HOUR = 3600
+STEPS = 12            # 5-minute candles per hour
+
+def load_bars(pattern: str = DATA_GLOB) -> dict:
+    """{product_id: {hour start: (open, high, low, close, volume)}} from the training CSVs."""
+    bars = {}
+    for path in sorted(glob.glob(pattern)):
+        df = pd.read_csv(path)
+        product = str(df["symbol"].iloc[0]).replace("/", "-")
+        vol = [c for c in df.columns if c.startswith("Volume ") and c != "Volume USD"][0]
+        bars[product] = {
+            int(r.unix): (float(r.open), float(r.high), float(r.low), float(r.close), float(v))
+            for r, v in zip(df.itertuples(index=False), df[vol])
+        }
+    return bars
+
+def five_minute_candles(start: int, o: float, h: float, l: float, c: float, v: float) -> list:
+    """Split one hourly bar into STEPS candles that aggregate back to it."""
+    first, second = (l, h) if c >= o else (h, l)
+    legs = STEPS // 3
+    path = np.concatenate([
+        np.linspace(o, first, legs + 1),
+        np.linspace(first, second, legs + 1)[1:],
+        np.linspace(second, c, legs + 1)[1:],
+    ])
+    share = v / STEPS
+    out = []
+    for k in range(STEPS):
+        a, b = float(path[k]), float(path[k + 1])
+        vol = v - share * (STEPS - 1) if k == STEPS - 1 else share
+        out.append({"start": start + k * HOUR // STEPS, "open": a, "high": max(a, b),
+                    "low": min(a, b), "close": b, "volume": vol})
+    return out
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _candle_msg(product: str, candle: dict) -> dict:
+    return {"start": str(candle["start"]), "high": repr(candle["high"]), "low": repr(candle["low"]),
+            "open": repr(candle["open"]), "close": repr(candle["close"]),
+            "volume": repr(candle["volume"]), "product_id": product}
+
+async def _session(ws, bars: dict, hours: list, speed: float):
+    subs = {"candles": set(), "ticker": set()}
+    seq = itertools.count()
+    player = None
+
+    async def send(channel: str, key: str, item: dict):
+        await ws.send(json.dumps({
+            "channel": channel, "client_id": "", "timestamp": _now(),
+            "sequence_num": next(seq), "events": [{"type": "update", key: [item]}],
+        }))
+
+    async def play():
+        for hour in hours:
+            products = sorted(p for p in subs["candles"] | subs["ticker"] if hour in bars.get(p, {}))
+            steps = {p: five_minute_candles(hour, *bars[p][hour]) for p in products}
+            for k in range(STEPS):
+                for p in products:
+                    final = steps[p][k]
+                    # mid-candle update first: half the volume, close half-way
+                    mid_close = (final["open"] + final["close"]) / 2
+                    partial = dict(final, close=mid_close, volume=final["volume"] / 2,
+                                   high=max(final["open"], mid_close), low=min(final["open"], mid_close))
+                    for candle in (partial, final):
+                        if p in subs["candles"]:
+                            await send("candles", "candles", _candle_msg(p, candle))
+                        if p in subs["ticker"]:
+                            await send("ticker", "tickers", {"type": "ticker", "product_id": p,
+                                                             "price": repr(candle["close"])})
+                await asyncio.sleep(speed / STEPS)
+        print("🏁 Replay finished")
+
+    try:
+        async for raw in ws:
+            msg = json.loads(raw)
+            targets = subs.get(msg.get("channel"))
+            if targets is None:
+                continue
+            products = set(msg.get("product_ids", []))
+            if msg.get("type") == "subscribe":
+                targets |= products
+                print(f"📡 {msg['channel']} ← {', '.join(sorted(products))}")
+            elif msg.get("type") == "unsubscribe":
+                targets -= products
+            if player is None:
+                player = asyncio.create_task(play())
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        if player is not None:
+            player.cancel()
+
+def replay_hours(bars: dict, hours: int, start=None) -> list:
+    """The `hours` hour starts to play, from `start` or ending at the newest bar."""
+    every = sorted(set().union(*(b.keys() for b in bars.values())))
+    if start is not None:
+        every = [t for t in every if t >= start]
+        return every[:hours]
+    return every[-hours:]
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, speed: float = 1.0,
+                hours: int = 48, start=None, pattern: str = DATA_GLOB):
+    bars = load_bars(pattern)
+    timeline = replay_hours(bars, hours, start)
+    async with websockets.serve(lambda ws, *_: _session(ws, bars, timeline, speed), host, port):
+        print(f"🎞️ Replaying {len(timeline)}h of {len(bars)} products on ws://{host}:{port}")
+        await asyncio.Future()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay bulma/*.csv as a Coinbase market-data WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1.0, help="wall seconds per replayed hour")
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--start", help="first hour to play (YYYY-MM-DD[ HH:MM]); default: the newest --hours")
+    parser.add_argument("--data", default=DATA_GLOB, help="CSV glob")
+    args = parser.parse_args()
+    start = int(pd.Timestamp(args.start, tz="UTC").timestamp()) if args.start else None
+    asyncio.run(serve(args.host, args.port, args.speed, args.hours, start, args.data))
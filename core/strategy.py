@@ -7,92 +7,77 @@ Beerus Strategy (balanced version)
 • Confidence = average score of all agreeing champions.
 • Stop-loss handling identical to previous implementation.
 • No external modules beyond pandas and code already present in the repo.
+• Indicators come from core.indicators, computed in one pass over the frame.
 """
 
-import pandas as pd
 from core.data_feed import fetch_live_candles
+from core.indicators import IndicatorSet, as_indicators
 
-# ────────────────────────── Indicator helpers ──────────────────────────
-def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    hl = df["high"] - df["low"]
-    hc = (df["high"] - df["close"].shift()).abs()
-    lc = (df["low"] - df["close"].shift()).abs()
-    tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
-
-def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    delta = df["close"].diff()
-    gain  = delta.clip(lower=0).rolling(period).mean()
-    loss  = (-delta.clip(upper=0)).rolling(period).mean()
-    rs    = gain / loss
-    return 100 - 100 / (1 + rs)
-
-def calculate_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9):
-    fast_ema = df["close"].ewm(span=fast).mean()
-    slow_ema = df["close"].ewm(span=slow).mean()
-    macd     = fast_ema - slow_ema
-    macd_sig = macd.ewm(span=signal).mean()
-    return macd, macd_sig, macd - macd_sig
-
-# ────────────────────────── Champion strategies ────────────────────────
-def gohan_strat(df: pd.DataFrame):
-    if len(df) < 50:
-        return "hold", 0.0
-
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    macd_hist = macd_hist.iloc[-1]
-    sma10 = df["close"].rolling(10).mean().iloc[-1]
-    sma50 = df["close"].rolling(50).mean().iloc[-1]
-    vol_now, vol_avg = df["volume"].iloc[-1], df["volume"].rolling(20).mean().iloc[-1]
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-2]) / df["close"].iloc[-2]
+# ────────────────────────── Champion scores ────────────────────────────
+# Scored from an IndicatorSet (IndicatorSet.from_frame of a candle DataFrame),
+# so one pass over the frame serves all three champions.
 
+def gohan_score(ind: IndicatorSet) -> float:
+    if ind.bars < 50:
+        return 0.0
+    rsi = ind.rsi
     score = 0.0
     if 30 <= rsi <= 70: score += 2
     elif rsi < 30:      score += 3
-    if macd_hist > 0:   score += 2
-    if sma10 > sma50:   score += 2
-    if vol_now > vol_avg * 1.2: score += 1.5
-    if price_change > 0.01:     score += 1.5
+    if ind.macd_hist > 0:     score += 2
+    if ind.sma10 > ind.sma50: score += 2
+    if ind.volume > ind.volume_sma20 * 1.2: score += 1.5
+    if ind.change(1) > 0.01:                score += 1.5
+    return score
+
+def jiren_score(ind: IndicatorSet) -> float:
+    if ind.bars < 50:
+        return 0.0
+    rsi = ind.rsi
+    score = 0.0
+    if 40 <= rsi <= 65:               score += 2.5
+    if ind.macd > ind.macd_signal:    score += 2.5
+    if ind.close > ind.sma20:         score += 2
+    if ind.volume > ind.volume_sma20 * 1.1: score += 0.5
+    return score
+
+def freezer_score(ind: IndicatorSet) -> float:
+    if ind.bars < 30:
+        return 0.0
+    score = 0.0
+    if ind.rsi > 50:           score += 2
+    if ind.macd_hist > 0:      score += 2
+    if ind.change(4) > 0.02:   score += 2
+    return score
 
+# ────────────────────────── Champion strategies ────────────────────────
+# Each accepts a candle DataFrame or an IndicatorSet built from one.
+def gohan_strat(df):
+    ind = as_indicators(df)
+    if ind.bars < 50:
+        return "hold", 0.0
+
+    score = gohan_score(ind)
     if score >= 6: return "buy",  score
     if score < 3:  return "sell", score
     return "hold", score
 
-def jiren_strat(df: pd.DataFrame):
-    if len(df) < 50:
+def jiren_strat(df):
+    ind = as_indicators(df)
+    if ind.bars < 50:
         return "hold", 0.0
 
-    rsi = calculate_rsi(df).iloc[-1]
-    macd_line, macd_sig, _ = calculate_macd(df)
-    macd_line, macd_sig = macd_line.iloc[-1], macd_sig.iloc[-1]
-    sma20 = df["close"].rolling(20).mean().iloc[-1]
-    vol_now, vol_avg = df["volume"].iloc[-1], df["volume"].rolling(20).mean().iloc[-1]
-
-    score = 0.0
-    if 40 <= rsi <= 65:            score += 2.5
-    if macd_line > macd_sig:       score += 2.5
-    if df["close"].iloc[-1] > sma20: score += 2
-    if vol_now > vol_avg * 1.1:      score += 0.5
-
+    score = jiren_score(ind)
     if score >= 7.5: return "buy",  score
     if score < 2:    return "sell", score
     return "hold", score
 
-def freezer_strat(df: pd.DataFrame):
-    if len(df) < 30:
+def freezer_strat(df):
+    ind = as_indicators(df)
+    if ind.bars < 30:
         return "hold", 0.0
 
-    rsi = calculate_rsi(df).iloc[-1]
-    _, _, macd_hist = calculate_macd(df)
-    macd_hist = macd_hist.iloc[-1]
-    price_change = (df["close"].iloc[-1] - df["close"].iloc[-5]) / df["close"].iloc[-5]
-
-    score = 0.0
-    if rsi > 50:            score += 2
-    if macd_hist > 0:       score += 2
-    if price_change > 0.02: score += 2
-
+    score = freezer_score(ind)
     if score >= 4.5: return "buy",  score
     return "hold", score
 
@@ -121,8 +106,10 @@ class BeerusStrategy:
         if df.empty or len(df) < 60:
             return "hold", 0.0
 
-        close_price = df["close"].iloc[-1]
-        atr = calculate_atr(df).iloc[-1] or close_price * 0.02
+        # one pass of the streaming accumulators: the batch formulas' values on df
+        ind = IndicatorSet.from_frame(df)
+        close_price = ind.close
+        atr = ind.atr or close_price * 0.02
 
         # ───── Stop-loss check ─────
         if symbol in self.stop_losses and df["low"].iloc[-1] <= self.stop_losses[symbol]:
@@ -132,9 +119,9 @@ class BeerusStrategy:
             return "sell", 1.0  # confident exit
 
         # ───── Champion signals ─────
-        g_sig, g_sc = gohan_strat(df)
-        j_sig, j_sc = jiren_strat(df)
-        f_sig, f_sc = freezer_strat(df)
+        g_sig, g_sc = gohan_strat(ind)
+        j_sig, j_sc = jiren_strat(ind)
+        f_sig, f_sc = freezer_strat(ind)
 
         print(
             f"[DEBUG] {symbol}: "
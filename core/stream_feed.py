@@ -0,0 +1,175 @@
+# core/stream_feed.py
+"""
+WebSocket market data for the live loop (FEED=stream).
+
+• Subscribes to Coinbase's `candles` and `ticker` channels for the held
+  symbols and keeps them current in memory.
+• The channel sends 5-minute candles; they are folded into the hourly bars
+  of data_feed.CANDLES, so fetch_live_candles / prefetch_candles serve the
+  streamed bars without REST calls while the stream is flowing, and fall
+  back to incremental REST fetches when it stalls or drops messages.
+• wait() replaces the fixed sleep between cycles: it returns as soon as an
+  hourly candle closes or a ticker price crosses a stop level.
+
+`python -m core.replay_server` plays the bundled CSVs back over the same
+protocol for offline runs (COINBASE_WS_URL=ws://127.0.0.1:8765).
+"""
+
+import json
+import threading
+import time
+
+from coinbase.constants import WS_BASE_URL
+from coinbase.websocket import WSClient
+
+from core.data_feed import CANDLES
+
+HOUR = 3600
+GRANULARITY = "ONE_HOUR"
+CHANNELS = ["candles", "ticker"]
+
+class StreamFeed:
+    def __init__(self, url: str = WS_BASE_URL, stop_levels=None, on_close=None):
+        """
+        stop_levels: callable → {symbol: stop price}; a ticker at or below
+                     its level wakes the loop.
+        on_close:    callable(symbol, bar_start) for every closed hourly bar.
+        """
+        self.url = url
+        self.stop_levels = stop_levels or (lambda: {})
+        self.on_close = on_close
+        self.prices = {}
+        self.symbols = set()
+        self.hours = {}           # symbol → [hour start, {5m start: volume}, newest 5m start]
+        self.closed = []          # (symbol, bar start) since the last wait()
+        self.last_seq = None
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.client = None
+
+    # ───── connection ─────
+    def follow(self, symbols):
+        """Subscribe to `symbols`, dropping the ones no longer held."""
+        symbols = set(symbols)
+        if self.client is not None:
+            try:
+                self.client.raise_background_exception()
+            except Exception as e:
+                # the SDK gave up reconnecting; start over with a new client
+                print(f"⚠️ Market stream lost: {e}")
+                self.client, self.symbols = None, set()
+                self._resync()
+        if self.client is None:
+            self.client = WSClient(
+                api_key=None, api_secret=None, base_url=self.url,
+                on_message=self._on_message, on_open=self._resync,
+            )
+            self.client.open()
+        added, removed = sorted(symbols - self.symbols), sorted(self.symbols - symbols)
+        if removed:
+            self.client.unsubscribe(removed, CHANNELS)
+            with self.lock:
+                for sym in removed:
+                    self.hours.pop(sym, None)
+                    self.prices.pop(sym, None)
+        if added:
+            self.client.subscribe(added, CHANNELS)
+            print(f"📡 Streaming {', '.join(added)}")
+        self.symbols = symbols
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self.symbols = set()
+
+    def _resync(self):
+        # (re)connected or dropped messages: REST re-reads the bars, the fold re-bases on them
+        with self.lock:
+            self.hours.clear()
+            self.last_seq = None
+        CANDLES.expire([(sym, GRANULARITY) for sym in self.symbols])
+
+    # ───── messages ─────
+    def _on_message(self, raw: str):
+        try:
+            self._handle(json.loads(raw))
+        except Exception as e:
+            # never let a bad message kill the SDK's receive loop
+            print(f"⚠️ Stream message skipped: {e}")
+
+    def _handle(self, msg: dict):
+        seq = msg.get("sequence_num")
+        if seq is not None:
+            gap = self.last_seq is not None and seq != self.last_seq + 1
+            self.last_seq = seq
+            if gap:
+                print(f"⚠️ Stream gap before message {seq}; resyncing bars over REST")
+                self._resync()
+                self.last_seq = seq
+        channel = msg.get("channel")
+        for event in msg.get("events", []):
+            if channel == "candles":
+                for c in event.get("candles", []):
+                    self._on_candle(
+                        c["product_id"], int(c["start"]), float(c["open"]), float(c["high"]),
+                        float(c["low"]), float(c["close"]), float(c["volume"]),
+                    )
+            elif channel == "ticker":
+                for t in event.get("tickers", []):
+                    self._on_ticker(t["product_id"], float(t["price"]))
+
+    def _on_ticker(self, symbol: str, price: float):
+        self.prices[symbol] = price
+        stop = self.stop_levels().get(symbol)
+        if stop is not None and price <= stop:
+            self.wake.set()
+
+    def _on_candle(self, symbol, start, o, h, l, c, v):
+        hour = start - start % HOUR
+        closed = None
+        with self.lock:
+            if CANDLES.expired(symbol, GRANULARITY):
+                return  # resyncing: the next fetch re-reads the bars, then the fold resumes
+            last = CANDLES.last(symbol, GRANULARITY)
+            state = self.hours.get(symbol)
+            if last is None or hour > last[0]:
+                # a new hour: the previous bar (if any) just closed
+                closed = last[0] if last is not None else None
+                self.hours[symbol] = [hour, {start: v}, start]
+                CANDLES.put(symbol, GRANULARITY, (hour, l, h, o, c, v))
+            elif hour == last[0]:
+                if state is None or state[0] != hour:
+                    # bar came from REST, which already counted this 5m candle's volume
+                    state = self.hours[symbol] = [hour, {start: v}, start]
+                    delta = 0.0
+                else:
+                    delta = v - state[1].get(start, 0.0)
+                    state[1][start] = v
+                newest = start >= state[2]
+                state[2] = max(state[2], start)
+                _, lo, hi, op, cl, vol = last
+                CANDLES.put(symbol, GRANULARITY,
+                            (hour, min(lo, l), max(hi, h), op, c if newest else cl, vol + delta))
+            # hour < last[0]: late update for a closed bar; REST owns it now
+        if closed is not None:
+            with self.lock:
+                self.closed.append((symbol, closed))
+            if self.on_close is not None:
+                self.on_close(symbol, closed)
+            self.wake.set()
+
+    # ───── loop integration ─────
+    def price(self, symbol: str):
+        return self.prices.get(symbol)
+
+    def wait(self, timeout: float) -> list:
+        """Block until a bar closes, a stop is crossed or `timeout` passes.
+        Returns the (symbol, bar start) pairs closed meanwhile."""
+        if self.wake.wait(timeout):
+            # let the other symbols' closing updates land before evaluating
+            time.sleep(1.0)
+        self.wake.clear()
+        with self.lock:
+            closed, self.closed = self.closed, []
+        return closed
@@ -1,23 +1,160 @@
+import atexit
 import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def send_telegram_message(message: str, force_send=False):
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+# Messages go out from a background thread, so callers never wait on
+# Telegram. A burst collected over BATCH_WINDOW is sent as few posts as
+# possible: repeated errors/warnings of one kind ("❌ Candle fetch error: …")
+# fold into a single digest, everything else is packed whole.
+QUEUE_SIZE = 500        # oldest messages are dropped (and counted) beyond this
+BATCH_WINDOW = 2.0      # seconds a burst is gathered before sending
+COALESCE_MIN = 3        # same-kind errors in one batch that become a digest
+DIGEST_LINES = 10       # items listed in a digest
+MAX_LEN = 4096          # Telegram's message limit
+TIMEOUT = (5, 10)       # connect / read seconds
+MAX_ATTEMPTS = 4
+
+_FOLDABLE = ("❌", "⚠️", "⏳")
+_VARIABLE = re.compile(r"\b[A-Z0-9]+-[A-Z]+\b|\d+(?:\.\d+)?")
+
+def _kind(message: str) -> str:
+    head = message.split("\n", 1)[0].split(":", 1)[0]
+    return _VARIABLE.sub("*", head).strip()
+
+def _digest(kind: str, messages: list) -> str:
+    items = OrderedDict()
+    for m in messages:
+        head = m.split("\n", 1)[0]
+        item = (head.split(":", 1)[1].strip() if ":" in head else head)[:200]
+        items[item] = items.get(item, 0) + 1
+    lines = [f"{kind.replace('*', '…')} ×{len(messages)}"]
+    for item, n in list(items.items())[:DIGEST_LINES]:
+        lines.append(f"• {item}" + (f" ×{n}" if n > 1 else ""))
+    if len(items) > DIGEST_LINES:
+        lines.append(f"• … and {len(items) - DIGEST_LINES} more")
+    detail = messages[-1].split("\n", 1)[1:]
+    if detail:
+        lines.append(f"Last: {detail[0][:500]}")
+    return "\n".join(lines)
+
+def compose(messages: list, dropped: int = 0) -> list:
+    """One batch → the texts to post, each within MAX_LEN."""
+    groups = OrderedDict()
+    for m in messages:
+        key = _kind(m) if m.startswith(_FOLDABLE) else id(m)
+        groups.setdefault(key, []).append(m)
+    texts = []
+    for key, group in groups.items():
+        if isinstance(key, str) and len(group) >= COALESCE_MIN:
+            texts.append(_digest(key, group))
+        else:
+            texts.extend(group)
+    if dropped:
+        texts.append(f"⚠️ {dropped} Telegram messages dropped (queue full)")
+
+    posts, current = [], ""
+    for text in texts:
+        text = text[:MAX_LEN]
+        if current and len(current) + 2 + len(text) > MAX_LEN:
+            posts.append(current)
+            current = text
+        else:
+            current = f"{current}\n\n{text}" if current else text
+    if current:
+        posts.append(current)
+    return posts
 
-    if not token or not chat_id:
-        print("❌ Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID in .env")
-        return
+class TelegramNotifier:
+    def __init__(self, queue_size=QUEUE_SIZE, window=BATCH_WINDOW):
+        self.pending = deque(maxlen=queue_size)
+        self.window = window
+        self.dropped = 0
+        self.busy = False
+        self.cond = threading.Condition()
+        self.thread = None
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
+    def send(self, message: str):
+        with self.cond:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(str(message))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
 
-    try:
-        res = requests.post(url, data=payload)
-        res.raise_for_status()
-        print("✅ Telegram message sent.")
-    except Exception as e:
-        print(f"❌ Telegram error: {e}")
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far has been posted (or given up on)."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.busy:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self.cond.wait(left)
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.busy = False
+                    self.cond.notify_all()
+                    self.cond.wait()
+                self.busy = True
+            time.sleep(self.window)  # let the rest of the burst arrive
+            with self.cond:
+                batch, dropped = list(self.pending), self.dropped
+                self.pending.clear()
+                self.dropped = 0
+            for text in compose(batch, dropped):
+                self._post(text)
+
+    def _post(self, text: str):
+        token = os.getenv("TELEGRAM_BOT_TOKEN")
+        chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        if not token or not chat_id:
+            print("❌ Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID in .env")
+            return
+
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                res = self.session.post(url, data=payload, timeout=TIMEOUT)
+                if res.status_code == 429:
+                    # Telegram says how long to back off
+                    retry = res.json().get("parameters", {}).get("retry_after", 1)
+                    print(f"⏳ Telegram rate limited, retrying in {retry}s")
+                    time.sleep(float(retry))
+                    continue
+                if res.status_code == 400 and "parse" in res.text.lower() and "parse_mode" in payload:
+                    # batched text broke the Markdown: send it plain
+                    payload.pop("parse_mode")
+                    continue
+                res.raise_for_status()
+                print("✅ Telegram message sent.")
+                return
+            except Exception as e:
+                print(f"❌ Telegram error: {e}")
+                time.sleep(min(2 ** attempt, 10))
+        print(f"❌ Telegram message dropped after {MAX_ATTEMPTS} attempts")
+
+NOTIFIER = TelegramNotifier()
+# deliver what is queued when the process exits (e.g. sys.exit after a failed start-up)
+atexit.register(NOTIFIER.flush, 5.0)
+
+def send_telegram_message(message: str, force_send=False):
+    """Queue `message` for Telegram and return immediately."""
+    NOTIFIER.send(message)
 
 def start_telegram_bot():
-    send_telegram_message("🤖 Frankelly Bot is now running.")
\ No newline at end of file
+    send_telegram_message("🤖 Frankelly Bot is now running.")
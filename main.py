@@ -1,18 +1,22 @@
+import asyncio
+import functools
 import os
 import sys
 import time
 import uuid
-import decimal
-from threading import Thread
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from telegram.ext import ApplicationBuilder
 
 from bulma.bulma_engine import BulmaEngine
-from core.data_feed import fetch_live_candles
+from core.data_feed import PriceSnapshot, prefetch_candles
 from core.coin_selector import CoinSelector
+from core import latency
+from core.latency import timed
 from core.position_manager import PositionManager
-from core.portfolio_tracker import get_portfolio
+from core.products import PRODUCTS
+from core.stream_feed import StreamFeed, WS_BASE_URL
+from core.portfolio_tracker import PortfolioService
 from frankelly_telegram.bot import send_telegram_message
 from frankelly_telegram.commands import get_command_handlers, error_handler
 from frankelly_telegram.shared_state import BOT_STATE, STATS
@@ -57,214 +61,276 @@ MODE = os.getenv("MODE", "live").lower()
 send_telegram_message(f"✅ MODE: {MODE.upper()}", force_send=True)
 
 CHECK_INTERVAL = 600
+# FEED=stream: WebSocket bars/prices, evaluate when an hourly candle closes
+FEED = os.getenv("FEED", "rest").lower()
 MIN_TRADE_USD = 50
 DUST_CLEAN_INTERVAL = 172800  # 48 hours
 last_dust_cleanup = 0
+# blocking SDK / model calls run here, off the shared event loop
+SDK_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sdk")
 
 def get_base_precision(cb, product_id):
     try:
-        product = cb.get_product(product_id).to_dict()
-        base_increment = product.get("base_increment", "1")
-        decimals = abs(decimal.Decimal(base_increment).as_tuple().exponent)
-        return decimals
+        return PRODUCTS.precision(cb, product_id)
     except Exception as e:
         print(f"[DEBUG] precision lookup failed for {product_id}: {e}")
         return 0
 
-def run_dust_cleaner(cb):
+def run_dust_cleaner(cb, book):
     try:
-        portfolio, _ = get_portfolio(cb)
-        for base, amt, _ in portfolio:
+        held = book.balances()
+        prices = PriceSnapshot(cb).refresh(f"{base}-USD" for base in held if base != "USD")
+        for base, amt in held.items():
             if base == "USD":
                 continue
             sym = f"{base}-USD"
             try:
-                price = fetch_live_candles(cb, sym, "ONE_HOUR", 1)["close"].iloc[-1]
+                price = prices.price(sym)
                 usd_value = amt * price
                 if 0 < usd_value < MIN_TRADE_USD:
+                    if not PRODUCTS.tradable(cb, sym) or amt < PRODUCTS.min_size(cb, sym):
+                        continue  # Coinbase would reject the order
                     prec = get_base_precision(cb, sym)
                     size_str = format(round(amt, prec), f".{prec}f")
-                    cb.create_order(
-                        client_order_id=str(uuid.uuid4()),
-                        product_id=sym,
-                        side="SELL",
-                        order_configuration={"market_market_ioc": {"base_size": size_str}},
-                    )
+                    with timed("order", sym):
+                        resp = cb.create_order(
+                            client_order_id=str(uuid.uuid4()),
+                            product_id=sym,
+                            side="SELL",
+                            order_configuration={"market_market_ioc": {"base_size": size_str}},
+                        )
+                    book.record_order(resp)
             except Exception as e:
                 print(f"[DEBUG] Dust clean failed for {sym}: {e}")
     except Exception as e:
         print(f"[DEBUG] Dust cleaner failed: {e}")
 
-def run_bot():
+def prepare_cycle(selector, feed, book, pm):
+    """Blocking set-up of a cycle: rotation, symbols, balances, one price snapshot."""
+    rotated = selector.rotate_coins()
+    if rotated:
+        send_telegram_message("🔁 Rotated coins: " + ", ".join(rotated), force_send=True)
+    if not BOT_STATE["running"]:
+        return None
+
+    state = selector.load_state()
+    held = state.get("held", [])
+    symbols = [f"{c}-USD" for c in held]
+    if feed is not None:
+        feed.follow(symbols)
+    # balances come from memory (fills applied, periodic resync);
+    # one bulk price call covers every price this cycle needs
+    balance_map = book.balances()
+    prices = PriceSnapshot(cb).refresh(
+        symbols + [f"{c}-USD" for c in balance_map if c != "USD"]
+    )
+    portfolio, _ = book.portfolio(prices)
+    allocations = pm.allocate(portfolio, held)
+    return symbols, balance_map, prices, allocations
+
+def predict_signals(strat, candles, balances):
+    with timed("predict"):
+        return strat.predict_batch(candles, balances)
+
+def trade_symbol(book, sym, signal, conf, prices, allocations):
+    """BUY/SELL for one symbol on the balances as they stand after earlier orders."""
+    balance_map = book.balances()
+    base = sym.split("-")[0]
+    current_balance = balance_map.get(base, 0.0)
+
+    # === BUY ===
+    if signal == "buy" and conf > 0:
+        usd_size = allocations.get(base, 0.0) or MIN_TRADE_USD
+        usd_size = max(usd_size, MIN_TRADE_USD)
+
+        # === Enforce 25% max allocation per coin and only 1 add-on
+        try:
+            price = prices.price(sym)
+            current_usd_value = current_balance * price
+            total_value = sum(
+                balance_map.get(c, 0.0) * prices.price(f"{c}-USD")
+                for c in balance_map if c != "USD"
+            ) + balance_map.get("USD", 0.0)
+            max_allowed = total_value * 0.25
+
+            if current_usd_value > 0 and current_usd_value >= (max_allowed / 2):
+                return  # Already added on once
+
+            if current_usd_value + usd_size > max_allowed:
+                usd_size = max_allowed - current_usd_value
+
+            if usd_size < MIN_TRADE_USD:
+                return
+        except Exception as e:
+            print(f"[DEBUG] allocation check failed for {sym}: {e}")
+            return
+
+        available_usd = balance_map.get("USD", 0.0)
+        if available_usd < usd_size:
+            return
+
+        try:
+            with timed("order", sym):
+                resp = cb.create_order(
+                    client_order_id=str(uuid.uuid4()),
+                    product_id=sym,
+                    side="BUY",
+                    order_configuration={"market_market_ioc": {"quote_size": str(round(usd_size, 2))}},
+                )
+            # no Beerus ATR/entry/stop logic needed here
+            STATS["trades"] += 1
+            book.record_order(resp)
+            portfolio, total = book.portfolio(prices)
+            holdings = "\n".join([f"{b}: {amt:.4f}" for b, amt, _ in portfolio])
+            msg = (
+                f"💸 *BUY {sym}* (conf: {conf:.2f})\n{resp}\n\n"
+                f"**Portfolio Balance**: ${total:.2f}\n**Holdings:**\n{holdings}\n\n"
+                f"Profit %: {STATS['profit_pct']:.2f}%\nTrades: {STATS['trades']}"
+            )
+            send_telegram_message(msg, force_send=True)
+        except Exception as e:
+            print(f"[DEBUG] buy error: {e}")
+
+    # === SELL ===
+    elif signal == "sell" and conf > 0 and current_balance > 0:
+        price = prices.price(sym)
+        usd_value = current_balance * price
+
+        if usd_value < MIN_TRADE_USD:
+            return
+
+        partial_sell = current_balance * 0.7
+        partial_usd = partial_sell * price
+        remaining_usd = (current_balance - partial_sell) * price
+
+        if partial_usd >= MIN_TRADE_USD and remaining_usd >= MIN_TRADE_USD:
+            sell_size = partial_sell
+        else:
+            sell_size = current_balance
+
+        if sell_size <= 0:
+            return
+
+        prec = get_base_precision(cb, sym)
+        sell_size_str = format(round(sell_size, prec), f".{prec}f")
+
+        try:
+            with timed("order", sym):
+                resp = cb.create_order(
+                    client_order_id=str(uuid.uuid4()),
+                    product_id=sym,
+                    side="SELL",
+                    order_configuration={"market_market_ioc": {"base_size": sell_size_str}},
+                )
+            STATS["trades"] += 1
+            book.record_order(resp)
+            portfolio, total = book.portfolio(prices)
+            holdings = "\n".join([f"{b}: {amt:.4f}" for b, amt, _ in portfolio])
+            msg = (
+                f"💸 *SELL {sym}* (conf: {conf:.2f})\n{resp}\n\n"
+                f"**Portfolio Balance**: ${total:.2f}\n**Holdings:**\n{holdings}\n\n"
+                f"Profit %: {STATS['profit_pct']:.2f}%\nTrades: {STATS['trades']}"
+            )
+            send_telegram_message(msg, force_send=True)
+        except Exception as e:
+            print(f"[DEBUG] sell error: {e}")
+
+async def blocking(fn, *args, pool=SDK_POOL):
+    """Run a blocking (SDK / model) call off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+
+async def evaluate(symbols, strat, book, balance_map, prices, allocations):
+    """
+    The cycle's pipeline: every symbol's candles at once (prefetch_candles'
+    pool, paced by LIMITER), one predict_batch over all of them, then the
+    orders one at a time, since they share the cash balance.
+    """
+    try:
+        candles = await blocking(prefetch_candles, cb, symbols, "ONE_HOUR", 100)
+        balances = {sym: balance_map.get(sym.split("-")[0], 0.0) for sym in symbols}
+        signals = await blocking(predict_signals, strat, candles, balances)
+    except Exception as e:
+        print(f"[DEBUG] Bulma error: {e}")
+        signals = {}
+
+    for sym in symbols:
+        signal, conf = signals.get(sym, ("hold", 0.0))
+        print(f"[DEBUG] {sym} signal={signal}, conf={conf:.2f}")
+        if signal in ("buy", "sell") and conf > 0:
+            await blocking(trade_symbol, book, sym, signal, conf, prices, allocations)
+
+async def run_bot():
     global last_dust_cleanup
     try:
-        strat = BulmaEngine()
+        strat = await blocking(BulmaEngine)
+        strat.watch_model()
+        await blocking(PRODUCTS.warm, cb)
+        feed = None
+        if FEED == "stream":
+            feed = StreamFeed(
+                os.getenv("COINBASE_WS_URL", WS_BASE_URL),
+                stop_levels=lambda: strat.stop_losses,
+            )
         selector = CoinSelector(cb)
+        book = PortfolioService(cb)
         pm = PositionManager(hold_ratio=0.3, min_cash_ratio=0.1, max_trade_ratio=0.9)
         send_telegram_message("🔎 Trading bot initialized with Bulma", force_send=True)
     except Exception as e:
         send_telegram_message(f"❌ Bot init error: {e}", force_send=True)
         return
 
-    state = selector.load_state()
-    held = state.get("held", [])
-
-    portfolio, _ = get_portfolio(cb)
+    portfolio, _ = await blocking(book.portfolio)
     lines = ["📊 **Initial Portfolio Summary**"]
     for base, bal, _ in portfolio:
         lines.append(f"{base}: {bal:.4f}")
     send_telegram_message("\n".join(lines), force_send=True)
 
     while True:
+        cycle_start = time.perf_counter()
         try:
-            rotated = selector.rotate_coins()
-            if rotated:
-                send_telegram_message("🔁 Rotated coins: " + ", ".join(rotated), force_send=True)
-
-            if not BOT_STATE["running"]:
-                time.sleep(CHECK_INTERVAL)
+            cycle = await blocking(prepare_cycle, selector, feed, book, pm)
+            if cycle is None:
+                await asyncio.sleep(CHECK_INTERVAL)
                 continue
+            symbols, balance_map, prices, allocations = cycle
 
-            state = selector.load_state()
-            held = state.get("held", [])
-            symbols = [f"{c}-USD" for c in held]
-            portfolio, _ = get_portfolio(cb)
-            allocations = pm.allocate(portfolio, held)
-
-            balance_map = {base: bal for base, bal, _ in portfolio}
-            traded_this_cycle = set()
-
-            for sym in symbols:
-                if sym in traded_this_cycle:
-                    continue
-
-                base = sym.split("-")[0]
-                current_balance = balance_map.get(base, 0.0)
-                # --- BULMA prediction ---
-                try:
-                    candles = fetch_live_candles(cb, sym, "ONE_HOUR", 100)
-                    signal, conf = strat.predict(sym, candles, current_balance=current_balance)
-                except Exception as e:
-                    print(f"[DEBUG] Bulma error: {e}")
-                    signal, conf = "hold", 0.0
-                print(f"[DEBUG] {sym} signal={signal}, conf={conf:.2f}")
-
-                # === BUY ===
-                if signal == "buy" and conf > 0:
-                    usd_size = allocations.get(base, 0.0) or MIN_TRADE_USD
-                    usd_size = max(usd_size, MIN_TRADE_USD)
-
-                    # === Enforce 25% max allocation per coin and only 1 add-on
-                    try:
-                        price = fetch_live_candles(cb, sym, "ONE_HOUR", 1)["close"].iloc[-1]
-                        current_usd_value = current_balance * price
-                        total_value = sum(
-                            balance_map.get(c, 0.0) * fetch_live_candles(cb, f"{c}-USD", "ONE_HOUR", 1)["close"].iloc[-1]
-                            for c in balance_map if c != "USD"
-                        ) + balance_map.get("USD", 0.0)
-                        max_allowed = total_value * 0.25
-
-                        if current_usd_value > 0 and current_usd_value >= (max_allowed / 2):
-                            continue  # Already added on once
-
-                        if current_usd_value + usd_size > max_allowed:
-                            usd_size = max_allowed - current_usd_value
-
-                        if usd_size < MIN_TRADE_USD:
-                            continue
-                    except Exception as e:
-                        print(f"[DEBUG] allocation check failed for {sym}: {e}")
-                        continue
-
-                    available_usd = balance_map.get("USD", 0.0)
-                    if available_usd < usd_size:
-                        continue
-
-                    try:
-                        resp = cb.create_order(
-                            client_order_id=str(uuid.uuid4()),
-                            product_id=sym,
-                            side="BUY",
-                            order_configuration={"market_market_ioc": {"quote_size": str(round(usd_size, 2))}},
-                        )
-                        # no Beerus ATR/entry/stop logic needed here
-                        STATS["trades"] += 1
-                        portfolio, total = get_portfolio(cb)
-                        holdings = "\n".join([f"{b}: {amt:.4f}" for b, amt, _ in portfolio])
-                        msg = (
-                            f"💸 *BUY {sym}* (conf: {conf:.2f})\n{resp}\n\n"
-                            f"**Portfolio Balance**: ${total:.2f}\n**Holdings:**\n{holdings}\n\n"
-                            f"Profit %: {STATS['profit_pct']:.2f}%\nTrades: {STATS['trades']}"
-                        )
-                        send_telegram_message(msg, force_send=True)
-                        traded_this_cycle.add(sym)
-                    except Exception as e:
-                        print(f"[DEBUG] buy error: {e}")
-
-                # === SELL ===
-                elif signal == "sell" and conf > 0 and current_balance > 0:
-                    price = fetch_live_candles(cb, sym, "ONE_HOUR", 1)["close"].iloc[-1]
-                    usd_value = current_balance * price
-
-                    if usd_value < MIN_TRADE_USD:
-                        continue
-
-                    partial_sell = current_balance * 0.7
-                    partial_usd = partial_sell * price
-                    remaining_usd = (current_balance - partial_sell) * price
-
-                    if partial_usd >= MIN_TRADE_USD and remaining_usd >= MIN_TRADE_USD:
-                        sell_size = partial_sell
-                    else:
-                        sell_size = current_balance
-
-                    if sell_size <= 0:
-                        continue
-
-                    prec = get_base_precision(cb, sym)
-                    sell_size_str = format(round(sell_size, prec), f".{prec}f")
-
-                    try:
-                        resp = cb.create_order(
-                            client_order_id=str(uuid.uuid4()),
-                            product_id=sym,
-                            side="SELL",
-                            order_configuration={"market_market_ioc": {"base_size": sell_size_str}},
-                        )
-                        STATS["trades"] += 1
-                        portfolio, total = get_portfolio(cb)
-                        holdings = "\n".join([f"{b}: {amt:.4f}" for b, amt, _ in portfolio])
-                        msg = (
-                            f"💸 *SELL {sym}* (conf: {conf:.2f})\n{resp}\n\n"
-                            f"**Portfolio Balance**: ${total:.2f}\n**Holdings:**\n{holdings}\n\n"
-                            f"Profit %: {STATS['profit_pct']:.2f}%\nTrades: {STATS['trades']}"
-                        )
-                        send_telegram_message(msg, force_send=True)
-                        traded_this_cycle.add(sym)
-                    except Exception as e:
-                        print(f"[DEBUG] sell error: {e}")
+            # fetching waits on the slowest symbol, not the sum of them all
+            await evaluate(symbols, strat, book, balance_map, prices, allocations)
 
             if time.time() - last_dust_cleanup >= DUST_CLEAN_INTERVAL:
-                run_dust_cleaner(cb)
+                await blocking(run_dust_cleaner, cb, book)
                 last_dust_cleanup = time.time()
 
+            latency.record("cycle", time.perf_counter() - cycle_start)
+            print(latency.summary())
+
         except Exception as e:
             send_telegram_message(f"❌ Bot loop error: {e}", force_send=True)
-            time.sleep(30)
+            await asyncio.sleep(30)
 
-        time.sleep(CHECK_INTERVAL)
+        if feed is not None:
+            closed = await blocking(feed.wait, CHECK_INTERVAL)
+            if closed:
+                print(f"🕐 Candle closed: {', '.join(sorted({sym for sym, _ in closed}))}")
+        else:
+            await asyncio.sleep(CHECK_INTERVAL)
+
+async def start_trading(app):
+    # the trading loop runs as a task on the Telegram application's event loop
+    app.bot_data["trading"] = asyncio.get_running_loop().create_task(run_bot())
 
 def run_telegram():
-    try:
-        app = ApplicationBuilder().token(TELE_TOKEN).build()
-        for h in get_command_handlers():
-            app.add_handler(h)
-        app.add_error_handler(error_handler)
-        send_telegram_message("✅ Telegram bot started OK.", force_send=True)
-        app.run_polling(drop_pending_updates=True)
-    except Exception as e:
-        print(f"❌ Telegram thread failed: {e}")
+    app = ApplicationBuilder().token(TELE_TOKEN).post_init(start_trading).build()
+    for h in get_command_handlers():
+        app.add_handler(h)
+    app.add_error_handler(error_handler)
+    send_telegram_message("✅ Telegram bot started OK.", force_send=True)
+    app.run_polling(drop_pending_updates=True)
 
 if __name__ == "__main__":
-    Thread(target=run_bot, daemon=True).start()
-    run_telegram()
+    try:
+        run_telegram()
+    except Exception as e:
+        # keep trading without the command bot
+        print(f"❌ Telegram failed: {e}")
+        asyncio.run(run_bot())
@@ -0,0 +1,5 @@
+# Make the repo packages (core/, bulma/) importable when pytest runs from anywhere
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
@@ -0,0 +1,52 @@
+# Local stand-in for the Coinbase REST client: latency and 429s on demand
+import threading
+import time
+
+class RateLimited(Exception):
+    """Shaped like the SDK's HTTPError for a 429."""
+
+    def __init__(self):
+        super().__init__("429 Client Error: Too Many Requests")
+        self.response = type("Response", (), {"status_code": 429})()
+
+class FakeCoinbase:
+    """
+    get_candles with `latency` seconds per call. `throttle` maps a product id
+    to how many of its calls answer 429 before it succeeds.
+    """
+
+    def __init__(self, latency=0.0, throttle=None):
+        self.latency = latency
+        self.throttle = dict(throttle or {})
+        self.calls = []          # (product_id, monotonic start, status)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get_candles(self, product_id, start, end, granularity, limit=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            limited = self.throttle.get(product_id, 0) > 0
+            if limited:
+                self.throttle[product_id] -= 1
+            self.calls.append((product_id, time.monotonic(), 429 if limited else 200))
+        try:
+            time.sleep(self.latency)
+            if limited:
+                raise RateLimited()
+            step = 3600 if granularity == "ONE_HOUR" else 300
+            first = -(-int(start) // step) * step
+            starts = range(first, int(end) + 1, step)
+            # newest first with string fields, as Coinbase sends them
+            return {"candles": [
+                {"start": str(t), "low": "1.0", "high": "2.0", "open": "1.5",
+                 "close": str(1.5 + (t // step) % 7 / 100), "volume": "10"}
+                for t in reversed(starts)
+            ]}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def calls_for(self, product_id):
+        return [c for c in self.calls if c[0] == product_id]
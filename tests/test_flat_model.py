@@ -0,0 +1,70 @@
+# Flat Bulma model vs sklearn
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.frozen import FrozenEstimator
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import RobustScaler
+
+from bulma.flat_model import export_flat, load_flat
+
+def _data(classes, rows=1500, features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(rows, features)), columns=[f"f{i}" for i in range(features)])
+    score = X["f0"] + 0.5 * X["f1"] * X["f2"] + rng.normal(scale=0.5, size=rows)
+    y = np.where(score > 0.4, classes[0], classes[-1])
+    if len(classes) == 3:
+        y[np.abs(score) <= 0.4] = classes[1]
+    # NaNs exercise the missing-value branches
+    X.iloc[rng.integers(0, rows, 50), 3] = np.nan
+    return X, y
+
+def _booster():
+    return HistGradientBoostingClassifier(max_iter=30, random_state=42)
+
+def _check(scaler, model, X, tmp_path):
+    path = export_flat(scaler, model, tmp_path / "model.npz")
+    flat_scaler, flat_model = load_flat(path)
+    X_scaled = scaler.transform(X)
+    np.testing.assert_allclose(flat_scaler.transform(X), X_scaled, rtol=0, atol=0)
+    expected = model.predict_proba(X_scaled)
+    got = flat_model.predict_proba(flat_scaler.transform(X))
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+    assert list(flat_model.classes_) == list(model.classes_)
+    np.testing.assert_array_equal(flat_model.predict(X_scaled), model.predict(X_scaled))
+
+def test_cv_fold_ensemble(tmp_path):
+    X, y = _data(["buy", "hold", "sell"])
+    scaler = RobustScaler().fit(X)
+    model = CalibratedClassifierCV(_booster(), method="isotonic", cv=TimeSeriesSplit(n_splits=3))
+    model.fit(scaler.transform(X), y)
+    assert len(model.calibrated_classifiers_) == 3
+    _check(scaler, model, X, tmp_path)
+
+def test_prefit_frozen_estimator(tmp_path):
+    X, y = _data(["buy", "hold", "sell"], seed=1)
+    scaler = RobustScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    cut = int(len(y) * 0.8)
+    booster = _booster().fit(X_scaled[:cut], y[:cut])
+    model = CalibratedClassifierCV(FrozenEstimator(booster), method="isotonic", ensemble="auto")
+    model.fit(X_scaled[cut:], y[cut:])
+    assert len(model.calibrated_classifiers_) == 1
+    _check(scaler, model, X, tmp_path)
+
+def test_binary(tmp_path):
+    X, y = _data(["buy", "sell"], seed=2)
+    scaler = RobustScaler().fit(X)
+    model = CalibratedClassifierCV(_booster(), method="isotonic", cv=3)
+    model.fit(scaler.transform(X), y)
+    _check(scaler, model, X, tmp_path)
+
+def test_rejects_sigmoid_calibration(tmp_path):
+    X, y = _data(["buy", "sell"], seed=3)
+    scaler = RobustScaler().fit(X)
+    model = CalibratedClassifierCV(_booster(), method="sigmoid", cv=3)
+    model.fit(scaler.transform(X), y)
+    with pytest.raises(ValueError):
+        export_flat(scaler, model, tmp_path / "model.npz")
@@ -0,0 +1,75 @@
+# Token bucket and concurrent candle prefetch against a fake Coinbase
+import time
+
+import pytest
+
+from core import data_feed
+from core.data_feed import CandleCache, TokenBucket, prefetch_candles
+from fake_coinbase import FakeCoinbase
+
+@pytest.fixture
+def limiter(monkeypatch):
+    bucket = TokenBucket(rate=100, capacity=10, base_backoff=0.05, max_backoff=0.2)
+    monkeypatch.setattr(data_feed, "LIMITER", bucket)
+    monkeypatch.setattr(data_feed, "CANDLES", CandleCache())
+    return bucket
+
+def test_throttled_backoff_doubles_and_halves_rate():
+    bucket = TokenBucket(rate=20, capacity=1, base_backoff=0.05, max_backoff=0.15)
+    first = bucket.throttled()
+    assert 0.05 <= first <= 0.05 * 1.25
+    assert bucket.rate == 10
+    # a second 429 from the same burst waits out the same pause
+    assert bucket.throttled() <= first
+    assert bucket.strikes == 1 and bucket.rate == 10
+
+    time.sleep(first)
+    assert 0.1 <= bucket.throttled() <= 0.1 * 1.25
+    assert bucket.rate == 5
+    time.sleep(0.13)
+    assert 0.15 <= bucket.throttled() <= 0.15 * 1.25   # capped at max_backoff
+
+    bucket.succeeded()
+    assert bucket.strikes == 0 and bucket.rate == 3.5
+
+def test_acquire_waits_out_the_pause():
+    bucket = TokenBucket(rate=100, capacity=5, base_backoff=0.1)
+    pause = bucket.throttled()
+    t0 = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - t0 >= pause - 0.01
+
+def test_acquire_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()   # spend the burst
+    t0 = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+    assert 0.45 <= time.monotonic() - t0 < 0.8
+
+def test_prefetch_retries_rate_limited_symbol(limiter):
+    symbols = [f"C{i}-USD" for i in range(6)]
+    client = FakeCoinbase(latency=0.05, throttle={"C3-USD": 2})
+    t0 = time.monotonic()
+    frames = prefetch_candles(client, symbols, "ONE_HOUR", 100, workers=6)
+    elapsed = time.monotonic() - t0
+
+    assert list(frames) == symbols
+    for sym, df in frames.items():
+        assert len(df) >= 100, sym
+        assert list(df.columns) == ["date", "open", "high", "low", "close", "volume"]
+    # two 429s, then the retry that succeeded
+    assert [status for _, _, status in client.calls_for("C3-USD")] == [429, 429, 200]
+    assert client.max_in_flight > 1
+    assert elapsed < 0.05 * len(client.calls)
+    assert limiter.strikes == 0
+
+def test_prefetch_honours_limiter_rate(limiter, monkeypatch):
+    slow = TokenBucket(rate=20, capacity=1)
+    monkeypatch.setattr(data_feed, "LIMITER", slow)
+    symbols = [f"C{i}-USD" for i in range(9)]
+    client = FakeCoinbase(latency=0.0)
+    prefetch_candles(client, symbols, "ONE_HOUR", 50, workers=8)
+    starts = sorted(t for _, t, _ in client.calls)
+    # one burst token, then 20/s however many workers ask
+    assert starts[-1] - starts[0] >= (len(starts) - 2) / 20 - 0.02
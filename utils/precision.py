@@ -1,5 +1,7 @@
 from decimal import Decimal, ROUND_DOWN
 
+from core.products import PRODUCTS
+
 
 def _get_increment(info: dict) -> Decimal:
     """
@@ -24,7 +26,7 @@ def format_size(cb_client, product_id: str, raw_size: float) -> str:
 
     Returns a string without superfluous trailing zeros.
     """
-    info = cb_client.get_product(product_id).to_dict()
+    info = PRODUCTS.get(cb_client, product_id)        # cached metadata
     inc  = _get_increment(info)                       # ← NEW logic
     size = (Decimal(str(raw_size))                    # preserve precision
             .quantize(inc, rounding=ROUND_DOWN))      # truncate